@@ -18,9 +18,10 @@ from .pyparsing import Word, OneOrMore, Optional, Literal, NotAny, MatchFirst
 from .pyparsing import Group, oneOf, Suppress, ZeroOrMore, Combine, FollowedBy
 from .pyparsing import srange, CharsNotIn, StringEnd, LineEnd, White, Regex
 from .pyparsing import nums, alphas, alphanums, ParseException, Forward
+from .pyparsing import ParserElement
 try:    import xml.etree.cElementTree as E
 except: import xml.etree.ElementTree as E
-import types, sys, os, re, datetime
+import types, sys, os, re, datetime, threading
 
 VERSION = 245
 
@@ -39,10 +40,12 @@ else:
     uni_type = types.UnicodeType
     stdin = sys.stdin
 
-info_list = []  # diagnostic messages
+local = threading.local ()      # local.mxm = instance of MusicXml parsing in the current thread
+info_list = []  # diagnostic messages issued outside MusicXml.parse
 def info (s, warn=1):
     x = (warn and '-- ' or '') + s
-    info_list.append (x + '\n')         # collect messages
+    mxm = getattr (local, 'mxm', None)
+    (mxm.info_list if mxm else info_list).append (x + '\n')   # collect messages per conversion
     if __name__ == '__main__':          # only write to stdout when called as main progeam
         try: sys.stderr.write (x + '\n')
         except: sys.stderr.write (repr (x) + '\n')
@@ -292,13 +295,11 @@ class pObj (object):    # every relevant parse result is converted into a pObj
             else:                        xs.append (repr (x))   # pObj -> recursive call
         return '(' + s.name + ' ' +','.join (xs) + ')'
 
-global prevloc                  # global to remember previous match position of a note/rest
-prevloc = 0
 def detectBeamBreak (line, loc, t):
-    global prevloc              # location in string 'line' of previous note match
-    xs = line[prevloc:loc+1]    # string between previous and current note match
+    mxm = local.mxm             # the MusicXml instance remembers the previous match position of a note/rest
+    xs = line[mxm.prevloc:loc+1]    # string between previous and current note match
     xs = xs.lstrip ()           # first note match starts on a space!
-    prevloc = loc               # location in string 'line' of current note match
+    mxm.prevloc = loc           # location in string 'line' of current note match
     b = pObj ('bbrk', [' ' in xs])      # space somewhere between two notes -> beambreak
     t.insert (0, b)             # insert beambreak as a nested parse result
 
@@ -863,7 +864,7 @@ class MusicXml:
         s.creator = {}      # {creator-type -> creator string}
         s.metadata = {}     # {metadata-type -> string}
         s.lyrdash = {}      # {lyric number -> 1 if dash between syllables}
-        s.usrSyms = s.uSyms # user defined symbols
+        s.usrSyms = s.uSyms.copy () # user defined symbols
         s.prevNote = None   # xml element of previous beamed note to correct beams (start, continue)
         s.prevLyric = {}    # xml element of previous lyric to add/correct extend type (start, continue)
         s.grcbbrk = False   # remember any bbrk in a grace sequence
@@ -899,6 +900,8 @@ class MusicXml:
         s.percsnd = [x.split (',') for x in ch10.split (';')]   # {name -> midi number} of standard channel 10 sound names
         s.gTime = (0,0)     # (XML begin time, XML end time) in divisions
         s.tabStaff = ''     # == pid (part ID) for a tab staff
+        s.prevloc = 0       # location in the voice string of the previous note match (see detectBeamBreak)
+        s.info_list = []    # diagnostic messages of this conversion
 
     def mkPitch (s, acc, note, oct, lev):
         if s.percVoice: # percussion map switched off by perc=off (see doClef)
@@ -1981,7 +1984,13 @@ class MusicXml:
                 addElem (misc, mf, lev + 1)
         if mf != 0: addElem (parent, misc, lev)
 
-    def parse (s, abc_string, rOpt=False, bOpt=False, fOpt=False):
+    def parse (s, abc_string, rOpt=False, bOpt=False, fOpt=False): # all conversion state is kept in s -> thread safe
+        prev = getattr (local, 'mxm', None)
+        local.mxm = s               # parse actions and info () of this thread report to s
+        try:     return s.parseTune (abc_string, rOpt, bOpt, fOpt)
+        finally: local.mxm = prev
+
+    def parseTune (s, abc_string, rOpt, bOpt, fOpt):
         abctext = abc_string.replace ('[I:staff ','[I:staff')  # avoid false beam breaks
         s.reset (fOpt)
         header, voices = splitHeaderVoices (abctext)
@@ -2037,6 +2046,8 @@ class MusicXml:
             else:
                 info ('Syntax error at column %d' % err.col, warn=0)
             raise
+        finally:                # do not keep the packrat memo (if enabled) of this tune; the memo is per
+            ParserElement.resetCache ()     # thread, so this only clears the calling thread's entries
 
         score = E.Element ('score-partwise')
         attrmap = {'Div': str (s.divisions), 'K':'C treble', 'M':'4/4'}
@@ -2116,7 +2127,7 @@ def xml2mxl (pad, fnm, data):   # write xml data to compressed .mxl file
     info ('%s written' % outfile, warn=0)
 
 def convert (pad, fnm, abc_string, mxl, rOpt=False, tOpt=False, bOpt=False, fOpt=False):  # not used, backwards compatibility
-    score = mxm.parse (abc_string, rOpt, bOpt, fOpt)
+    score = MusicXml ().parse (abc_string, rOpt, bOpt, fOpt)
     writefile (pad, fnm, '', score, mxl, tOpt)
 
 def writefile (pad, fnm, fnmNum, xmldoc, mxlOpt, tOpt=False):
@@ -2159,14 +2170,20 @@ def expand_abc_include (abctxt):
         if x != None: ys.append (x)
     return '\n'.join (ys)
 
+def enablePackrat (limit=None):  # memoize the parser, at most limit entries per thread (None = unbounded)
+    ParserElement.enablePackrat (limit)
+
 abc_header, abc_voice, abc_scoredef, abc_percmap = abc_grammar () # compute grammars only once
-mxm = MusicXml ()               # same for instance of MusicXml
+for g in (abc_header, abc_voice, abc_scoredef, abc_percmap):
+    g.streamline ()             # now, so that threads only read the grammars
+mxm = MusicXml ()               # instance of MusicXml for the command line program
 
 def getXmlScores (abc_string, skip=0, num=1, rOpt=False, bOpt=False, fOpt=False): # not used, backwards compatibility
     return [fixDoctype (xml_doc) for xml_doc in
         getXmlDocs (abc_string, skip=0, num=1, rOpt=False, bOpt=False, fOpt=False)]
 
-def getXmlDocs (abc_string, skip=0, num=1, rOpt=False, bOpt=False, fOpt=False): # added by David Randolph
+def getXmlDocs (abc_string, skip=0, num=1, rOpt=False, bOpt=False, fOpt=False, mxm=None): # added by David Randolph
+    if mxm is None: mxm = MusicXml ()   # a new instance for each call -> thread safe
     xml_docs = []
     abctext = expand_abc_include (abc_string)
     fragments = re.split (r'^\s*X:', abctext, flags=re.M)
@@ -2178,7 +2195,8 @@ def getXmlDocs (abc_string, skip=0, num=1, rOpt=False, bOpt=False, fOpt=False):
         if itune >= skip + num: break
         tune = preamble + 'X:' + tune       # restore preamble before each tune
         try:                                # convert string abctext -> file pad/fnmNum.xml
-            score = mxm.parse (tune, rOpt, bOpt, fOpt)
+            try:     score = mxm.parse (tune, rOpt, bOpt, fOpt)
+            finally: info_list.extend (mxm.info_list)   # keep messages available for getInfo
             ds = list (score.iter ('duration')) # need to iterate twice
             ss = [int (d.text) for d in ds]
             deler = reduce (ggd, ss + [21]) # greatest common divisor of all durations
@@ -2199,7 +2217,7 @@ if __name__ == '__main__':
     from glob import glob
     import time
 
-    parser = OptionParser (usage='%prog [-h] [-r] [-t] [-b] [-m SKIP NUM] [-o DIR] [-p PFMT] [-z MODE] [--meta MAP] <file1> [<file2> ...]', version='version %d' % VERSION)
+    parser = OptionParser (usage='%prog [-h] [-r] [-t] [-b] [-m SKIP NUM] [-o DIR] [-p PFMT] [-z MODE] [--meta MAP] [--packrat LIMIT] <file1> [<file2> ...]', version='version %d' % VERSION)
     parser.add_option ("-o", action="store", help="store xml files in DIR", default='', metavar='DIR')
     parser.add_option ("-m", action="store", help="skip SKIP (0) tunes, then read at most NUM (1) tunes", nargs=2, type='int', default=(0,1), metavar='SKIP NUM')
     parser.add_option ("-p", action="store", help="pageformat PFMT (mm) = scale (0.75), pageheight (297), pagewidth (210), leftmargin (18), rightmargin (18), topmargin (10), botmargin (10)", default='', metavar='PFMT')
@@ -2209,6 +2227,7 @@ if __name__ == '__main__':
     parser.add_option ("-b", action="store_true", help="line break at EOL", default=False)
     parser.add_option ("--meta", action="store", help="map infofields to XML metadata, MAP = R:poet,Z:lyricist,N:...", default='', metavar='MAP')
     parser.add_option ("-f", action="store_true", help="force string/fret allocations for tab staves", default=False)
+    parser.add_option ("--packrat", action="store", type='int', help="memoize the parser, keeping at most LIMIT entries (0 = unbounded)", default=None, metavar='LIMIT')
     options, args = parser.parse_args ()
     if len (args) == 0: parser.error ('no input file given')
     pad = options.o
@@ -2217,6 +2236,9 @@ if __name__ == '__main__':
     if pad:
         if not os.path.exists (pad): os.mkdir (pad)
         if not os.path.isdir (pad): parser.error ('%s is not a directory' % pad)
+    if options.packrat is not None:
+        if options.packrat < 0: parser.error ('--packrat: LIMIT should not be negative')
+        enablePackrat (options.packrat or None)
     if options.p:   # set page formatting values
         try:        # space, page-height, -width, margin-left, -right, -top, -bottom
             mxm.pageFmtCmd = lmap (float, options.p.split (','))
@@ -2245,7 +2267,7 @@ if __name__ == '__main__':
             continue
         abctext = readfile (fnmext)
         skip, num = options.m
-        xml_docs = getXmlDocs (abctext, skip, num, options.r, options.b, options.f)
+        xml_docs = getXmlDocs (abctext, skip, num, options.r, options.b, options.f, mxm)
         for itune, xmldoc in enumerate (xml_docs):
             fnmNum = '%02d' % (itune + 1) if len (xml_docs) > 1 else ''
             writefile (pad, fnm, fnmNum, xmldoc, options.mxl, options.t)
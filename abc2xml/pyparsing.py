@@ -69,6 +69,7 @@ import warnings
 import re
 import sre_constants
 import collections
+import threading
 #~ sys.stderr.write( "testing pyparsing module, version %s, %s\n" % (__version__,__versionTime__ ) )
 
 __all__ = [
@@ -694,14 +695,21 @@ def _trim_arity(func, maxargs=2):
     limit = [0]
     foundArity = [False]
     def wrapper(*args):
+        # work on a local copy of the limit, so that concurrent first calls
+        # from several threads cannot push the shared limit past the arity
+        n = limit[0]
         while 1:
             try:
-                ret = func(*args[limit[0]:])
+                ret = func(*args[n:])
+                limit[0] = n
                 foundArity[0] = True
                 return ret
             except TypeError:
-                if limit[0] <= maxargs and not foundArity[0]:
-                    limit[0] += 1
+                if foundArity[0] and n != limit[0]:
+                    n = limit[0]
+                    continue
+                if n <= maxargs and not foundArity[0]:
+                    n += 1
                     continue
                 raise
     return wrapper
@@ -956,31 +964,52 @@ class ParserElement(object):
     # we can cache these arguments and save ourselves the trouble of re-parsing the contained expression
     def _parseCache( self, instring, loc, doActions=True, callPreParse=True ):
         lookup = (self,instring,loc,callPreParse,doActions)
-        if lookup in ParserElement._exprArgCache:
-            value = ParserElement._exprArgCache[ lookup ]
+        cache = ParserElement._exprArgCache()
+        value = cache.get( lookup )
+        if value is not None:
             if isinstance(value, Exception):
                 raise value
             return (value[0],value[1].copy())
         else:
             try:
                 value = self._parseNoCache( instring, loc, doActions, callPreParse )
-                ParserElement._exprArgCache[ lookup ] = (value[0],value[1].copy())
+                cache[ lookup ] = (value[0],value[1].copy())
+                ParserElement._trimCache(cache)
                 return value
             except ParseBaseException as pe:
                 pe.__traceback__ = None
-                ParserElement._exprArgCache[ lookup ] = pe
+                cache[ lookup ] = pe
+                ParserElement._trimCache(cache)
                 raise
 
     _parse = _parseNoCache
 
     # argument cache for optimizing repeated calls when backtracking through recursive expressions
-    _exprArgCache = {}
+    # each thread has its own cache: the cached tokens are shared objects that parse
+    # actions may modify, so they must never be handed over to a parse running in
+    # another thread, and resetCache() only clears the cache of the calling thread
+    _packratLocal = threading.local()
+    def _exprArgCache():
+        try:
+            return ParserElement._packratLocal.cache
+        except AttributeError:
+            cache = ParserElement._packratLocal.cache = collections.OrderedDict()
+            return cache
+    _exprArgCache = staticmethod(_exprArgCache)
     def resetCache():
-        ParserElement._exprArgCache.clear()
+        ParserElement._exprArgCache().clear()
     resetCache = staticmethod(resetCache)
 
+    # maximum number of entries kept in the packrat cache (None = unbounded)
+    _packratLimit = None
+    def _trimCache(cache):
+        limit = ParserElement._packratLimit
+        while limit is not None and len(cache) > limit:
+            cache.popitem(last=False)   # drop the oldest entry first
+    _trimCache = staticmethod(_trimCache)
+
     _packratEnabled = False
-    def enablePackrat():
+    def enablePackrat(cache_size_limit=None):
         """Enables "packrat" parsing, which adds memoizing to the parsing logic.
            Repeated parse attempts at the same string location (which happens
            often in many complex grammars) can immediately return a cached value,
@@ -995,7 +1024,12 @@ class ParserElement(object):
            C{enablePackrat} before calling C{psyco.full()}.  If you do not do this,
            Python will crash.  For best results, call C{enablePackrat()} immediately
            after importing pyparsing.
+
+           Optional C{cache_size_limit} bounds the number of memoized entries;
+           once it is exceeded, the oldest entries are discarded first.  The
+           default (C{None}) keeps the cache unbounded.
         """
+        ParserElement._packratLimit = cache_size_limit
         if not ParserElement._packratEnabled:
             ParserElement._packratEnabled = True
             ParserElement._parse = ParserElement._parseCache
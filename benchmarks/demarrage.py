@@ -0,0 +1,60 @@
+"""Temps de démarrage de gabctk pour chaque option de sortie
+
+Mesure la durée totale d'un appel de gabctk (démarrage de l'interpréteur,
+imports, lecture et conversion) sur une petite pièce, option par option :
+c'est le temps que paie chaque appel isolé, depuis un script ou un crochet
+web.
+
+Usage : python benchmarks/demarrage.py [--racine DOSSIER] [fichier.gabc]
+
+--racine désigne une autre copie de gabctk, pour comparer deux révisions.
+Par défaut, kyrie.gabc du corpus des tests.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ESSAIS = 15
+OPTIONS = ('-o', '-l', '-c', '-x', '-e', '-m', '-b')
+
+
+def mesurer(gabctk, fichier, option, sortie):
+    """Durée d'un appel de gabctk, en secondes"""
+    debut = time.perf_counter()
+    subprocess.run(
+        [sys.executable, gabctk, '-i', fichier, option, sortie],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True
+    )
+    return time.perf_counter() - debut
+
+
+def main():
+    """Médiane des durées pour chaque option"""
+    args = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    args.add_argument('--racine', default=RACINE)
+    args.add_argument(
+        'fichier', nargs='?',
+        default=os.path.join(RACINE, 'tests', 'corpus', 'kyrie.gabc')
+    )
+    opts = args.parse_args()
+    gabctk = os.path.join(os.path.abspath(opts.racine), 'gabctk.py')
+    with tempfile.TemporaryDirectory() as dossier:
+        sortie = os.path.join(dossier, 'sortie')
+        for option in OPTIONS:
+            durees = [
+                mesurer(gabctk, opts.fichier, option, sortie)
+                for _ in range(ESSAIS)
+            ]
+            print('%-3s médiane %4.0f ms, min %4.0f ms' % (
+                option, statistics.median(durees) * 1000,
+                min(durees) * 1000
+            ))
+
+
+if __name__ == '__main__':
+    main()
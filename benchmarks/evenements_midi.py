@@ -0,0 +1,65 @@
+"""Sérialisation des évènements d'une piste midi dense
+
+Mesure MIDITrack.writeEventsToStream sur une piste de 100 000 notes (une
+toutes les 480 ticks, soit 200 000 évènements), meilleur de 5 essais, avec
+et sans running status.
+
+Usage : python benchmarks/evenements_midi.py [--racine DOSSIER] [notes]
+
+--racine désigne une autre copie de gabctk, pour comparer la midiutil de
+deux révisions.
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ESSAIS = 5
+
+
+def piste(midifile, notes, running_status):
+    """Piste dense, fermée et prête à être sérialisée"""
+    hasard = random.Random(1)
+    midi = midifile(
+        1, eventtime_is_ticks=True, running_status=running_status
+    )
+    for i in range(notes):
+        midi.addNote(0, 0, hasard.randrange(50, 80), i * 480, 480, 100)
+    midi.close()
+    return midi.tracks[1]
+
+
+def mesurer(track):
+    """Meilleure durée de writeEventsToStream, en secondes"""
+    durees = []
+    for _ in range(ESSAIS):
+        track.MIDIdata = bytearray()
+        debut = time.perf_counter()
+        track.writeEventsToStream()
+        durees.append(time.perf_counter() - debut)
+    return min(durees)
+
+
+def main():
+    """Mesures avec et sans running status"""
+    args = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    args.add_argument('--racine', default=RACINE)
+    args.add_argument('notes', nargs='?', type=int, default=100000)
+    opts = args.parse_args()
+    sys.path.insert(0, os.path.abspath(opts.racine))
+    from midiutil.MidiFile import MIDIFile  # pylint:disable=C0415
+    for running_status in (False, True):
+        track = piste(MIDIFile, opts.notes, running_status)
+        duree = mesurer(track)
+        print('%-16s %d évènements : %4.0f ms, %d octets, md5 %s' % (
+            'running status' if running_status else 'par défaut',
+            len(track.MIDIEventList), duree * 1000, len(track.MIDIdata),
+            hashlib.md5(track.MIDIdata).hexdigest()[:8]
+        ))
+
+
+if __name__ == '__main__':
+    main()
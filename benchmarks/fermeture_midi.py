@@ -0,0 +1,78 @@
+"""Fermeture d'une grande piste midi : tri, doublons, désentrelacement
+
+Mesure MIDIFile.close sur une piste de 100 000 notes, meilleur de 3
+essais, pour deux pistes :
+
+- une piste comme celles de gabctk : un tempo par note, un texte une note
+  sur deux, les évènements étant ajoutés dans l'ordre de la partition ;
+- la même piste, les notes étant ajoutées dans le désordre.
+
+Dans les deux cas, la liste des évènements n'est pas triée : chaque note
+y ajoute son début puis sa fin, postérieure.
+
+Usage : python benchmarks/fermeture_midi.py [--racine DOSSIER] [notes]
+
+--racine désigne une autre copie de gabctk, pour comparer la midiutil de
+deux révisions.
+"""
+import argparse
+import hashlib
+import io
+import os
+import random
+import sys
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ESSAIS = 3
+
+
+def fichier(midifile, notes, desordre):
+    """Fichier midi d'une piste, non encore fermé"""
+    midi = midifile(1)
+    midi.addTrackName(0, 0, 'Essai')
+    midi.addTempo(0, 0, 82.5)
+    midi.addProgramChange(0, 0, 0, 74)
+    ordre = list(range(notes))
+    if desordre:
+        random.Random(1).shuffle(ordre)
+    for i in ordre:
+        temps = i / 2
+        midi.addTempo(0, temps, 82.5 if i % 3 else 66)
+        midi.addNote(0, 0, 60 + i % 7, temps, 0.5, 127)
+        if i % 2 == 0:
+            midi.addText(0, temps, 'syl-')
+    return midi
+
+
+def mesurer(midifile, notes, desordre):
+    """Meilleure durée de close, en secondes, et empreinte du fichier"""
+    durees = []
+    for _ in range(ESSAIS):
+        midi = fichier(midifile, notes, desordre)
+        debut = time.perf_counter()
+        midi.close()
+        durees.append(time.perf_counter() - debut)
+    tampon = io.BytesIO()
+    midi.writeFile(tampon)
+    return min(durees), hashlib.md5(tampon.getvalue()).hexdigest()[:8]
+
+
+def main():
+    """Mesures pour les deux ordres d'ajout des notes"""
+    args = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    args.add_argument('--racine', default=RACINE)
+    args.add_argument('notes', nargs='?', type=int, default=100000)
+    opts = args.parse_args()
+    sys.path.insert(0, os.path.abspath(opts.racine))
+    from midiutil.MidiFile import MIDIFile  # pylint:disable=C0415
+    for desordre in (False, True):
+        duree, empreinte = mesurer(MIDIFile, opts.notes, desordre)
+        print('%-21s %d notes : close %6.3f s, md5 %s' % (
+            'notes en désordre' if desordre else 'ordre de la partition',
+            opts.notes, duree, empreinte
+        ))
+
+
+if __name__ == '__main__':
+    main()
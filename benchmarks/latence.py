@@ -0,0 +1,72 @@
+"""Latence de la première note jouée
+
+Mesure, pour chaque fichier gabc, le temps écoulé entre le lancement de
+gabctk et l'arrivée dans un tube :
+
+- de la fin du fichier midi complet (-o -) ;
+- du premier message midi avec --direct et une transposition explicite,
+  la lecture commençant dès le premier mot ;
+- du premier message midi avec --direct et la transposition automatique,
+  qui demande d'analyser d'abord toute la partition.
+
+Usage : python benchmarks/latence.py [fichier.gabc…]
+(par défaut, le corpus des tests)
+"""
+import glob
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GABCTK = os.path.join(RACINE, 'gabctk.py')
+ESSAIS = 7
+
+
+def mesurer(arguments, premier_message):
+    """Durée jusqu'au premier message midi ou, à défaut, jusqu'à la fin"""
+    debut = time.perf_counter()
+    processus = subprocess.Popen(  # pylint:disable=R1732
+        [sys.executable, GABCTK] + arguments,
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    descripteur = processus.stdout.fileno()
+    recu = 0
+    while True:
+        morceau = os.read(descripteur, 65536)
+        if not morceau:
+            break
+        recu += len(morceau)
+        if premier_message and recu >= 3:
+            break
+    duree = time.perf_counter() - debut
+    processus.kill()
+    processus.wait()
+    processus.stdout.close()
+    return duree
+
+
+def main(fichiers):
+    """Mesures sur chaque fichier"""
+    for fichier in fichiers:
+        for libelle, arguments, premier_message in (
+                ('-o - (fichier complet)', ['-o', '-'], False),
+                ('--direct -d 0 (1re note)', ['-o', '-', '--direct', '-d', '0'],
+                 True),
+                ('--direct (1re note)', ['-o', '-', '--direct'], True),
+        ):
+            durees = [
+                mesurer(['-i', fichier] + arguments, premier_message)
+                for _ in range(ESSAIS)
+            ]
+            print('%-16s %-26s médiane %4.0f ms, min %4.0f ms' % (
+                os.path.basename(fichier), libelle,
+                statistics.median(durees) * 1000, min(durees) * 1000
+            ))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or sorted(
+        glob.glob(os.path.join(RACINE, 'tests', 'corpus', '*.gabc'))
+    ))
@@ -0,0 +1,74 @@
+"""Mémoire occupée par une partition, en octets par note
+
+Mesure avec tracemalloc la mémoire retenue par Gabc.partition() pour des
+pièces synthétiques de taille croissante, et la divise par le nombre de
+notes.
+
+Usage : python benchmarks/memoire.py [--racine DOSSIER] [mots…]
+
+--racine désigne une autre copie de gabctk (par exemple une extraction
+d'une révision antérieure), pour comparer avant et après une modification.
+Par défaut, pièces de 600 et 20 000 mots.
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NOTES = 'cdefghijk'
+NUANCES = ('', '', '', '_', '.', "'", '~')
+
+
+def piece(mots, graine=0):
+    """Code gabc d'une pièce synthétique de quelques syllabes par mot"""
+    hasard = random.Random(graine)
+    code = ['name:Synthèse;\n%%\n(c4) ']
+    for mot in range(mots):
+        for _ in range(hasard.randrange(1, 4)):
+            code.append('la(%s)' % ''.join(
+                hasard.choice(NOTES) + hasard.choice(NUANCES)
+                for _ in range(hasard.randrange(1, 6))
+            ))
+        code.append(' ')
+        if mot % 8 == 7:
+            code.append(hasard.choice(('(,) ', '(;) ', '(:) ')))
+    code.append('(::)\n')
+    return ''.join(code)
+
+
+def mesurer(gabctk, mots):
+    """Octets retenus par la partition, et nombre de notes"""
+    gabc = gabctk.Gabc(piece(mots))
+    gc.collect()
+    tracemalloc.start()
+    partition = gabc.partition()
+    gc.collect()
+    taille = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    notes = sum(
+        isinstance(signe, gabctk.Note)
+        for neume in partition.musique for signe in neume
+    )
+    return taille, notes
+
+
+def main():
+    """Mesures pour chaque taille de pièce"""
+    args = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    args.add_argument('--racine', default=RACINE)
+    args.add_argument('mots', nargs='*', type=int, default=[600, 20000])
+    opts = args.parse_args()
+    sys.path.insert(0, os.path.abspath(opts.racine))
+    import gabctk  # pylint:disable=C0415
+    for mots in opts.mots:
+        taille, notes = mesurer(gabctk, mots)
+        print('%6d mots, %6d notes : %8d octets, %4d octets/note' % (
+            mots, notes, taille, taille // notes
+        ))
+
+
+if __name__ == '__main__':
+    main()
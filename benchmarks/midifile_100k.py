@@ -0,0 +1,98 @@
+"""Écriture par MIDIFile d'une piste de 100 000 notes
+
+La sérialisation des pistes (MIDITrack.writeMIDIStream) doit croître
+linéairement avec le nombre de notes : chaque doublement ne doit coûter
+qu'environ deux fois plus de temps. La mémoire de pointe de writeFile est
+mesurée sur un fichier de plusieurs pistes, sérialisées une à une.
+
+Usage : python benchmarks/midifile_100k.py [nombre de notes…]
+(par défaut 12 500 à 200 000)
+"""
+import hashlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from midiutil.MidiFile import MIDIFile  # noqa: E402 pylint:disable=C0413
+
+
+def fichier(notes, pistes=1):
+    """Fichier d'autant de notes d'une demi-noire, sur chaque piste"""
+    midi = MIDIFile(pistes)
+    midi.addTempo(0, 0, 120)
+    for piste in range(pistes):
+        midi.addNotes(piste, 0, [
+            (60 + i % 12, i * 0.5, 0.5, 100) for i in range(notes)
+        ])
+    return midi
+
+
+def serialisation(notes):
+    """Durée de la sérialisation seule, tri et fermeture exclus"""
+    midi = fichier(notes)
+    midi.closeTracks()
+    debut = time.perf_counter()
+    for piste in midi.tracks:
+        piste.writeMIDIStream()
+    duree = time.perf_counter() - debut
+    midi.closed = True
+    tampon = io.BytesIO()
+    midi.writeFile(tampon)
+    return duree, tampon.getvalue()
+
+
+class Compteur:  # pylint:disable=R0903
+    """Sortie qui ne garde rien, mais compte les octets reçus"""
+    def __init__(self):
+        self.octets = 0
+
+    def write(self, octets):
+        """Comptage des octets"""
+        self.octets += len(octets)
+
+
+def memoire(notes, pistes, fermer=False):
+    """Mémoire de pointe de writeFile, hors construction des évènements
+
+    Avec fermer=True, MIDIFile.close est appelée d'abord : toutes les
+    pistes sont alors sérialisées avant d'être écrites.
+    """
+    midi = fichier(notes, pistes)
+    midi.closeTracks()
+    sortie = Compteur()
+    tracemalloc.start()
+    if fermer:
+        midi.close()
+    midi.writeFile(sortie)
+    pointe = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return pointe, sortie.octets
+
+
+def main(tailles):
+    """Mesures pour chaque taille"""
+    for notes in tailles:
+        durees = []
+        for _ in range(2):
+            duree, octets = serialisation(notes)
+            durees.append(duree)
+        print('%7d notes : %7.3f s (meilleur de 2), %8d octets, md5 %s' % (
+            notes, min(durees), len(octets),
+            hashlib.md5(octets).hexdigest()[:8]
+        ))
+    for fermer in (False, True):
+        pointe, taille = memoire(25000, 8, fermer)
+        print('8 pistes de 25 000 notes%s : pointe %.2f Mo pour un fichier '
+              'de %.2f Mo' % (
+                  ' (close)' if fermer else '', pointe / 1e6, taille / 1e6
+              ))
+
+
+if __name__ == '__main__':
+    main([int(n) for n in sys.argv[1:]] or [
+        12500, 25000, 50000, 100000, 200000
+    ])
@@ -0,0 +1,74 @@
+"""Production du MusicXML : écriture directe contre abc2xml
+
+Pour chaque fichier gabc, mesure :
+
+- la seule conversion d'une partition déjà analysée, par MusicXML et par
+  Abc.xml (abc2xml), meilleur de quelques essais ;
+- un appel complet de gabctk avec -x, avec et sans --abc2xml.
+
+Usage : python benchmarks/musicxml.py [fichier.gabc…]
+(par défaut, le corpus des tests)
+"""
+import contextlib
+import glob
+import io
+import os
+import subprocess
+import sys
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+import gabctk  # noqa: E402 pylint:disable=C0413
+
+ESSAIS = 5
+TEMPO = 165
+
+
+def conversion(classe, partition):
+    """Meilleure durée de production du MusicXML, en secondes"""
+    durees = []
+    for _ in range(ESSAIS):
+        debut = time.perf_counter()
+        classe(partition, titre='Essai', tempo=TEMPO).octets  # noqa
+        durees.append(time.perf_counter() - debut)
+    return min(durees)
+
+
+def appel(fichier, *options):
+    """Durée d'un appel complet de gabctk, en secondes"""
+    debut = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(RACINE, 'gabctk.py'),
+         '-i', fichier, '-x', os.devnull, *options],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True
+    )
+    return time.perf_counter() - debut
+
+
+def main(fichiers):
+    """Mesures sur chaque fichier"""
+    # Charger abc2xml d'avance, pour ne pas compter son import.
+    gabctk.charger_abc2xml()
+    for fichier in fichiers:
+        with open(fichier, encoding='utf-8') as source, \
+                contextlib.redirect_stderr(io.StringIO()):
+            partition = gabctk.Gabc(source.read()).partition()
+        nom = os.path.basename(fichier)
+        print('%-14s conversion : abc2xml %7.1f ms, directe %6.1f ms' % (
+            nom,
+            conversion(gabctk.Abc, partition) * 1000,
+            conversion(gabctk.MusicXML, partition) * 1000
+        ))
+        print('%-14s appel -x :   abc2xml %7.0f ms, directe %6.0f ms' % (
+            nom,
+            min(appel(fichier, '--abc2xml') for _ in range(ESSAIS)) * 1000,
+            min(appel(fichier) for _ in range(ESSAIS)) * 1000
+        ))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or sorted(
+        glob.glob(os.path.join(RACINE, 'tests', 'corpus', '*.gabc'))
+    ))
@@ -0,0 +1,89 @@
+"""Analyse du code abc par abc2xml, avec et sans mémoïsation (packrat)
+
+Pour chaque fichier gabc, le code abc produit par gabctk est converti par
+abc2xml sans mémoïsation, puis avec un cache packrat de plusieurs tailles
+et sans limite. Sont mesurés la médiane de quelques conversions et le pic
+de mémoire d'une conversion (tracemalloc). Le code MusicXML produit doit
+être le même dans tous les cas.
+
+Usage : python benchmarks/packrat.py [fichier.gabc…]
+(par défaut, le corpus des tests)
+"""
+import contextlib
+import glob
+import hashlib
+import io
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+import gabctk  # noqa: E402 pylint:disable=C0413
+
+ESSAIS = 5
+TEMPO = 165
+# Configurations mesurées : None pour l'analyse sans mémoïsation, 0 pour un
+# cache sans limite.
+LIMITES = (None, 128, 1024, 8192, 0)
+
+
+def regler(abc2xml, limite):
+    """Activation ou désactivation de la mémoïsation"""
+    parser = abc2xml.ParserElement
+    if limite is None:
+        # pyparsing ne sait pas désactiver la mémoïsation : on restaure
+        # son état initial.
+        # pylint:disable=W0212
+        parser._packratEnabled = False
+        parser._packratLimit = None
+        parser._parse = parser._parseNoCache
+    else:
+        abc2xml.enablePackrat(limite or None)
+
+
+def mesurer(abc):
+    """Médiane des durées, pic de mémoire et empreinte du résultat"""
+    durees = []
+    for _ in range(ESSAIS):
+        debut = time.perf_counter()
+        xml = abc.xml
+        durees.append(time.perf_counter() - debut)
+    tracemalloc.start()
+    abc.xml  # noqa pylint:disable=W0104
+    pic = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(durees), pic, hashlib.md5(
+        xml.encode('utf-8')
+    ).hexdigest()[:8]
+
+
+def main(fichiers):
+    """Mesures sur chaque fichier"""
+    abc2xml = gabctk.charger_abc2xml()
+    for fichier in fichiers:
+        with open(fichier, encoding='utf-8') as source, \
+                contextlib.redirect_stderr(io.StringIO()):
+            partition = gabctk.Gabc(source.read()).partition()
+        abc = gabctk.Abc(partition, titre='Essai', tempo=TEMPO)
+        nom = os.path.basename(fichier)
+        for limite in LIMITES:
+            regler(abc2xml, limite)
+            duree, pic, empreinte = mesurer(abc)
+            print('%-14s %-14s %8.1f ms %7.1f Mo  md5 %s' % (
+                nom,
+                'sans packrat' if limite is None
+                else 'sans limite' if limite == 0
+                else 'limite %d' % limite,
+                duree * 1000, pic / 1e6, empreinte
+            ))
+        regler(abc2xml, None)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or sorted(
+        glob.glob(os.path.join(RACINE, 'tests', 'corpus', '*.gabc'))
+    ))
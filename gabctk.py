@@ -14,27 +14,150 @@ partition.
 
 # Librairies externes ##################################################
 
+import io
 import os
 import sys
+from array import array
 from argparse import ArgumentParser
+from collections import deque
+from datetime import date
+from functools import cached_property, lru_cache
+from html import escape
+from itertools import repeat
 import re
+import stat
+import struct
+import time
 import unicodedata as ud
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
-from midiutil.MidiFile import MIDIFile  # noqa
-from abc2xml import abc2xml  # noqa
-abc2xml.info = lambda x, warn=1: x
-
-sys.setrecursionlimit(100000)
+from midiutil.MidiFile import (  # noqa
+    TICKSPERQUARTERNOTE, readVarLength, varLengthBytes
+)
+# abc2xml (et le pyparsing qu'il embarque) est long à charger : il n'est
+# importé qu'en cas de besoin, cf. charger_abc2xml.
 
 # Variables globales ###################################################
 
 TITRE = "Cantus"
 H_LA = 57  # Le nombre correspond au "pitch" MIDI.
+# Gamme à partir du la : nom de chaque degré et intervalle en demi-tons.
+GAMME = (
+    ('la', 0), ('si', 2), ('do', 3), ('re', 5), ('mi', 7), ('fa', 8),
+    ('sol', 10)
+)
+# Degré de la gamme correspondant à la lettre a, selon la clef.
+# N.B : c1, f1 et f2 n'existent pas normalement, mais cela ne nous regarde pas !
+DECALAGES = {
+    "c4": 0, "c3": 2, "c2": 4, "c1": 6, "f4": 3, "f3": 5, "f2": 0, "f1": 2
+}
+# Lettres portant un bémol à la clef (cb4, cb3…).
+BEMOLS_CLEF = {
+    "c4": 'bi', "c3": 'g', "c2": 'el', "c1": 'cj',
+    "f4": 'fm', "f3": 'dk', "f2": 'bi', "f1": 'g'
+}
+# Noms des notes, indexés par leur hauteur MIDI modulo 12.
+NOMS_NOTES = (
+    'Do', 'Do#', 'Ré', 'Mib', 'Mi', 'Fa', 'Fa#', 'Sol', 'Sol#', 'La', 'Sib',
+    'Si'
+)
+NOTES_LY = (
+    'c', 'cis', 'd', 'ees', 'e', 'f', 'fis', 'g', 'gis', 'a', 'bes', 'b'
+)
+# Octaves lilypond : on prévoit de la1 à sol7, ce qui est plutôt large !
+OCTAVES_LY = (", , ", ", ", "", "'", "''", "'''", "''''")
+# Notes abc, à partir du la (hauteur H_LA).
+NOTES_ABC = (
+    'A,', '_B,', 'B,',
+    'C', '_D', 'D', '_E', 'E', 'F', '_G', 'G', '_A', 'A', '_B', 'B',
+    'c', '_d', 'd', '_e', 'e', 'f', '_g', 'g', '_a', 'a', '_b', 'b',
+    "c'", "_d'", "d'", "_e'", "e'", "f'", "_g'", "g'", "_a'", "a'"
+)
 TEMPO = 165
 DUREE_EPISEME = 1.7
 DUREE_AVANT_QUILISMA = 2
 DUREE_POINT = 2.3
+# Nuances rythmiques d'une note : chacune correspond à un bit de l'entier
+# Note._nuances.
+ICTUS = 1
+EPISEME = 2
+POINT = 4
+QUILISMA = 8
+LIQUESCENCE = 16
+NUANCES = {
+    'ictus': ICTUS,
+    'episeme': EPISEME,
+    'point': POINT,
+    'quilisma': QUILISMA,
+    'liquescence': LIQUESCENCE,
+}
 DEBUG = False
+# Dossier où conserver le bytecode des modules que l'on ne peut compiler sur
+# place (cf. charger_abc2xml).
+DOSSIER_CACHE = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+    'gabctk'
+)
+# Codes de retour : ils peuvent se combiner lors du traitement d'un lot.
+CODE_FICHIER_INEXISTANT = 2
+CODE_ERREUR_SYNTAXE = 4
+CODE_ERREUR = 8
+CODE_ALERTES = 16
+# Séparation entre en-têtes et corps du gabc.
+SEPARATEUR_GABC = re.compile('%%\r?\n')
+# Catégories d'offices reconnues dans l'en-tête office-part.
+CATEGORIES = {
+    'alleluia': 'alleluia',
+    'antiphona': 'antiphona',
+    'antienne': 'antiphona',
+    'antiphon': 'antiphona',
+    'communio': 'communio',
+    'communion': 'communio',
+    'graduale': 'graduale',
+    'graduel': 'graduale',
+    'gradual': 'graduale',
+    'hymnus': 'hymnus',
+    'hymne': 'hymnus',
+    'hymn': 'hymnus',
+    'introitus': 'introitus',
+    'introit': 'introitus',
+    'kyriale': 'kyriale',
+    'lectio': 'lectio',
+    'leçon': 'lectio',
+    'lecon': 'lectio',
+    'lesson': 'lectio',
+    'offertorium': 'offertorium',
+    'offertoire': 'offertorium',
+    'offertory': 'offertorium',
+    'responsorium': 'responsorium',
+    'responsum': 'responsorium',
+    'répons': 'responsorium',
+    'repons': 'responsorium',
+    'response': 'responsorium',
+    'sequentia': 'sequentia',
+    'sequence': 'sequentia',
+    'tractus': 'tractus',
+    'trait': 'tractus',
+    'tract': 'tractus',
+    'versus': 'versus',
+    'verset': 'versus',
+    'verse': 'versus',
+}
+# Analyse lexicale du gabc d'un neume : chaque signe, même composé de
+# plusieurs caractères (clef, altération, note spéciale, double barre…),
+# correspond à un groupe nommé d'après la classe qui le représente.
+# L'ordre des alternatives importe ; les caractères non reconnus sont ignorés.
+SIGNES_GABC = re.compile(
+    r"(?P<Clef>[cf]b?[1234])"
+    r"|(?P<Alteration>[a-mA-M][xy#])"
+    r"|(?P<Custo>[a-mA-Mz]?\+)"
+    r"|(?P<NoteSpeciale>[a-mA-M]?[osvOSV])"
+    r"|(?P<Note>[a-mA-M])"
+    r"|(?P<SigneRythmique>[_.'w~])"
+    r"|(?P<Barre>::|[`,;:])"
+    r"|(?P<Coupure>[/ ])"
+    r"|(?P<Fin>z)"
+    r"|(?P<Cesure>!)"
+)
 ABC_ENTETE = '''
 X: 1
 T: %(titre)s
@@ -47,6 +170,84 @@ U: P = !uppermordent!
 w: %(paroles)s
 '''
 
+MXML_ENTETE = '''<?xml version='1.0' encoding='utf-8'?>
+<!DOCTYPE score-partwise PUBLIC "-//Recordare//DTD MusicXML 3.0 Partwise//EN" \
+"http://www.musicxml.org/dtds/partwise.dtd">
+<score-partwise>
+  <work>
+    <work-title>%(titre)s</work-title>
+  </work>
+  <identification>
+    <encoding>
+      <encoder>gabctk</encoder>
+      <encoding-date>%(date)s</encoding-date>
+    </encoding>
+  </identification>
+  <part-list>
+    <score-part id="P1">
+      <part-name />
+    </score-part>
+  </part-list>
+  <part id="P1">
+    <measure number="1">
+      <attributes>
+        <divisions>2</divisions>
+        <clef>
+          <sign>G</sign>
+          <line>2</line>
+        </clef>
+        <transpose>
+          <chromatic>%(transposition)s</chromatic>
+        </transpose>
+      </attributes>
+'''
+MXML_NOTE = '''      <note>
+        <pitch>
+          <step>%s</step>
+%s          <octave>%s</octave>
+        </pitch>
+%s'''
+MXML_CROCHE = '''        <duration>1</duration>
+        <voice>1</voice>
+        <type>eighth</type>
+'''
+MXML_NOIRE = '''        <duration>2</duration>
+        <voice>1</voice>
+        <type>quarter</type>
+'''
+MXML_ARTICULATION = '''          <articulations>
+            <%s />
+          </articulations>
+'''
+MXML_ORNEMENT = '''          <ornaments>
+            <%s />
+          </ornaments>
+'''
+MXML_BARRE = '''      <barline location="right">
+        <bar-style>%s</bar-style>
+      </barline>
+'''
+MXML_MESURE = '''    </measure>
+    <measure number="%s">
+'''
+MXML_PIED = '''    </measure>
+  </part>
+</score-partwise>'''
+# Style des barres de fin de mesure ('' pour une barre simple).
+MXML_BARRES = {
+    '`': 'none',
+    ',': 'none',
+    ';': 'none',
+    ':': '',
+    '::': 'light-light',
+}
+# Nom de chaque note et présence d'un bémol, selon la hauteur modulo 12.
+MXML_HAUTEURS = (
+    ('C', False), ('D', True), ('D', False), ('E', True), ('E', False),
+    ('F', False), ('G', True), ('G', False), ('A', True), ('A', False),
+    ('B', True), ('B', False)
+)
+
 # pylint:disable=W1401
 LILYPOND_ENTETE = '''\\version "2.18"
 
@@ -95,31 +296,6 @@ Paroles = \\lyricmode {
 # Méthodes globales ####################################################
 
 
-def aide(erreur, code, commande=os.path.basename(sys.argv[0])):
-    """Affichage de l'aide"""
-    # Tenir compte du message propre à chaque erreur, ainsi que du nom
-    # sous lequel la commande a été appelée.
-    sys.stderr.write(
-        ('Erreur : ' + erreur + '\n' if erreur != '' else '')
-        + 'Usage : \n    '
-        + commande + ' '
-        + '-i <input.gabc>\n          '
-        + '[-o <output.mid>]\n          '
-        + '[-l <output.ly>]\n          '
-        + '[-c <output.abc>]\n          '
-        + '[-x <output.xml>]\n          '
-        + '[-e <texte.txt>]\n          '
-        + '[-t <tempo>]\n          '
-        + '[-d <transposition>]\n          '
-        + '[-n <titre>]\n          '
-        + '[-a <alertes>]\n          '
-        + '[-v]\n'
-        )
-    # Renvoyer le code correspondant à l'erreur,
-    # pour interagir avec d'autres programmes.
-    sys.exit(code)
-
-
 def traiter_options(arguments):  # pylint:disable=R0912
     """Fonction maîtresse"""
     # Analyse des arguments de la ligne de commande.
@@ -131,6 +307,26 @@ def traiter_options(arguments):  # pylint:disable=R0912
     args.add_argument(
         '-o', '--midi', nargs='?', help='Sortie Midi',
     )
+    args.add_argument(
+        '--ticks', action='store_true',
+        help='Durées midi exactes, en ticks, avec un seul évènement de tempo'
+    )
+    args.add_argument(
+        '--compact', action='store_true',
+        help='Fichier midi plus compact (running status)'
+    )
+    args.add_argument(
+        '--direct', action='store_true',
+        help='Flux midi brut, joué en temps réel au fil de la lecture du gabc'
+    )
+    args.add_argument(
+        '--livre', help='Recueil midi : toutes les pièces dans un seul fichier'
+    )
+    args.add_argument(
+        '--sections', action='store_true',
+        help='Pièces du recueil dans une seule piste, délimitées par des '
+        'marqueurs'
+    )
     args.add_argument(
         '-l', '--lily', nargs='?', help='Sortie Lilypond'
     )
@@ -140,6 +336,15 @@ def traiter_options(arguments):  # pylint:disable=R0912
     args.add_argument(
         '-x', '--mxml', nargs='?', help='Sortie MusicXML'
     )
+    args.add_argument(
+        '--abc2xml', action='store_true',
+        help='Produire le MusicXML par conversion du code abc (abc2xml)'
+    )
+    args.add_argument(
+        '--packrat', type=int, metavar='LIMITE',
+        help='Avec --abc2xml : mémoriser les analyses partielles du code abc, '
+        'LIMITE au plus (0 : sans limite)'
+    )
     args.add_argument(
         '-e', '--export', nargs='?',
         help='Ficher texte où exporter les paroles seules'
@@ -153,7 +358,7 @@ def traiter_options(arguments):  # pylint:disable=R0912
     )
     args.add_argument(
         '-t', '--tempo', nargs=1, type=int, help='Tempo en notes par minute',
-        default=TEMPO
+        default=[TEMPO]
     )
     args.add_argument(
         '-d', '--transposition', nargs=1, type=int,
@@ -165,14 +370,173 @@ def traiter_options(arguments):  # pylint:disable=R0912
     args.add_argument(
         '-a', '--alerter', nargs='*', help='Caractères à signaler'
     )
+    args.add_argument(
+        '-j', '--jobs', nargs='?', type=int, const=os.cpu_count(), default=1,
+        help='Nombre de processus pour traiter les fichiers en parallèle'
+    )
     args.add_argument(
         '-v', '--verbose', action='store_true', help='Degré de verbosité'
     )
     opts = args.parse_args(arguments)
     if not opts.entree and opts.input:
         opts.entree = opts.input
-    for entree in opts.entree:
-        gabctk(entree, opts)
+    if opts.direct and opts.midi and not est_flux(opts.midi):
+        args.error(
+            '--direct : la sortie midi doit être - (sortie standard), '
+            'un périphérique ou un tube nommé'
+        )
+    if opts.packrat is not None and (not opts.abc2xml or opts.packrat < 0):
+        args.error(
+            '--packrat : LIMITE positive ou nulle, avec --abc2xml seulement'
+        )
+    if opts.livre and os.path.isdir(opts.livre):
+        args.error('--livre : le recueil doit être un fichier, non un dossier')
+    if len(opts.entree) > 1:
+        for option, chemin in (
+                ('-o', opts.midi), ('-l', opts.lily), ('-c', opts.abc),
+                ('-x', opts.mxml), ('-e', opts.export), ('-m', opts.musique),
+                ('-b', opts.tab)
+        ):
+            if chemin and not (os.path.isdir(chemin) or est_flux(chemin)):
+                args.error(
+                    '{} : avec plusieurs fichiers en entrée, la sortie doit '
+                    'être un dossier ou - (sortie standard)'.format(option)
+                )
+    code = 0
+    if opts.livre:
+        code |= traiter_livre(opts.entree, opts)
+    direct = opts.direct and opts.midi
+    if direct:
+        code |= traiter_direct(opts.entree, opts)
+        opts.midi = None
+    if not (opts.livre or direct) or any((
+            opts.midi, opts.lily, opts.abc, opts.mxml, opts.export,
+            opts.musique, opts.tab
+    )):
+        code |= traiter_lot(opts.entree, opts)
+    sys.exit(code)
+
+
+def traiter_lot(entrees, opts):
+    """Traitement d'un lot de fichiers gabc
+
+    Chaque fichier est analysé indépendamment des autres : une erreur dans
+    l'un d'eux n'interrompt pas le traitement des suivants. Les codes de
+    retour de chaque fichier sont combinés en un seul, qui est renvoyé.
+    """
+    return traiter_resultats(entrees, repartir(convertir, entrees, opts))
+
+
+def traiter_livre(entrees, opts):
+    """Création d'un recueil midi à partir d'un lot de fichiers gabc
+
+    Les pièces sont converties comme les fichiers d'un lot, éventuellement en
+    parallèle (option -j), puis assemblées dans l'ordre des entrées. Une pièce
+    en erreur est omise du recueil.
+    """
+    livre = LivreMidi(
+        os.path.splitext(os.path.basename(opts.livre))[0],
+        sections=opts.sections, compact=opts.compact
+    )
+    code = traiter_resultats(
+        entrees, repartir(convertir_piece, entrees, opts), livre.ajouter
+    )
+    try:
+        FichierTexte(opts.livre).ecrire(livre.octets)
+    except OSError as err:
+        code |= CODE_ERREUR
+        sys.stderr.write('{} : erreur ({}: {})\n'.format(
+            opts.livre, type(err).__name__, err
+        ))
+    return code
+
+
+def traiter_direct(entrees, opts):
+    """Lecture en direct d'un lot de fichiers gabc (cf. MidiDirect)
+
+    Les fichiers sont joués l'un après l'autre, chacun étant écrit sur la
+    sortie midi au fil de son analyse.
+    """
+    return traiter_resultats(
+        entrees, map(traiter_fichier, entrees, repeat(opts), repeat(jouer))
+    )
+
+
+def repartir(conversion, entrees, opts):
+    """Conversion de chaque fichier d'un lot, dans l'ordre des entrées
+
+    Si plusieurs processus sont demandés (option -j), les conversions sont
+    réparties entre eux ; seul le processus principal écrit les fichiers
+    produits et rassemble les erreurs. L'entrée standard ne pouvant être lue
+    que par lui, sa présence parmi les entrées impose un traitement en série.
+
+    Renvoie, pour chaque fichier, le résultat de traiter_fichier.
+    """
+    processus = opts.jobs or 1
+    if processus > 1 and len(entrees) > 1 and '-' not in entrees:
+        from concurrent import futures  # pylint:disable=C0415
+        with futures.ProcessPoolExecutor(max_workers=processus) as executeur:
+            yield from executeur.map(
+                traiter_fichier, entrees, repeat(opts), repeat(conversion),
+                chunksize=max(1, min(16, len(entrees) // (4 * processus)))
+            )
+    else:
+        yield from map(
+            traiter_fichier, entrees, repeat(opts), repeat(conversion)
+        )
+
+
+def traiter_resultats(entrees, resultats, ecrire=None):
+    """Écriture des sorties et combinaison des codes de retour d'un lot
+
+    Les sorties de chaque fichier sont confiées à ecrire, par défaut
+    ecrire_sorties.
+    """
+    ecrire = ecrire or ecrire_sorties
+    code = 0
+    for entree, (resultat, etat, sorties) in zip(entrees, resultats):
+        try:
+            ecrire(sorties)
+        except OSError as err:
+            resultat |= CODE_ERREUR
+            etat = 'erreur ({}: {})'.format(type(err).__name__, err)
+        code |= resultat
+        # Résumé fichier par fichier, seulement s'il y a plusieurs
+        # fichiers à traiter, ou si une erreur est survenue.
+        if len(entrees) > 1 or resultat & ~CODE_ALERTES:
+            sys.stderr.write('{} : {}\n'.format(entree, etat))
+    return code
+
+
+def traiter_fichier(entree, opts, conversion=None):
+    """Conversion d'un fichier
+
+    La conversion est faite par convertir, ou par la fonction donnée, qui
+    doit avoir la même signature. Renvoie son code de retour, son état et
+    les sorties à écrire.
+    """
+    conversion = conversion or convertir
+    try:
+        alertes, sorties = conversion(entree, opts)
+        if alertes:
+            return CODE_ALERTES, 'alertes', sorties
+        return 0, 'ok', sorties
+    except FileNotFoundError:
+        return CODE_FICHIER_INEXISTANT, 'fichier inexistant', []
+    except ErreurSyntaxe as err:
+        return CODE_ERREUR_SYNTAXE, 'erreur de syntaxe ({})'.format(err), []
+    except Exception as err:  # pylint:disable=W0703
+        if opts.verbose:
+            raise
+        return (
+            CODE_ERREUR, 'erreur ({}: {})'.format(type(err).__name__, err), []
+        )
+
+
+def ecrire_sorties(sorties):
+    """Écriture des sorties produites par convertir"""
+    for fichier, contenu in sorties:
+        fichier.ecrire(contenu)
 
 
 def sansaccents(input_str):
@@ -188,6 +552,80 @@ def sansaccents(input_str):
         .replace('œ́', 'oe')
 
 
+@lru_cache(maxsize=None)
+def hauteurs_gabc(cle, alterations):
+    """Table des hauteurs correspondant aux lettres gabc
+
+    Les lettres du gabc définissant une position sur la portée et non une
+    hauteur de note, la note correspondant à une lettre dépend de la clef
+    (ex. 'c4', 'cb3') et des altérations (tuple de couples (lettre, -1|0|1)).
+    La table associe à chaque lettre un couple (hauteur MIDI, avertissement).
+
+    Les tables sont calculées une fois pour toutes pour chaque combinaison.
+    """
+    # Traitement des bémols à la clé, que les altérations explicites
+    # (bécarre notamment) remplacent.
+    if len(cle) == 3:
+        cle = cle[0] + cle[2]
+        alterations = dict(
+            {lettre: -1 for lettre in BEMOLS_CLEF[cle]}, **dict(alterations)
+        )
+    else:
+        alterations = dict(alterations)
+    i = DECALAGES[cle] - 1
+    octve = -12 if cle == 'f3' else 0
+    table = {}
+    for lettre in "abcdefghijklm":
+        i += 1
+        if i == 7:
+            i %= 7
+            octve += 12
+        nom, intervalle = GAMME[i]
+        alteration = alterations.get(lettre, 0)
+        # N.B : le grégorien n'admet que le si bémol, mais il n'y avait
+        # pas de raison de se limiter à ce dernier. Cependant, on
+        # renvoie un avertissement si un autre bémol est rencontré, car
+        # il peut s'agir d'une erreur.
+        table[lettre] = (
+            H_LA + intervalle + octve + alteration,
+            nom + " bémol rencontré\n"
+            if alteration == -1 and nom != 'si' else ''
+        )
+    return table
+
+
+def charger_abc2xml():
+    """Import différé d'abc2xml
+
+    Le chargement du module (grammaire abc, pyparsing) coûte plus que la
+    conversion d'une partition en midi : on ne le paie donc que lorsqu'une
+    sortie MusicXML est demandée.
+
+    L'essentiel de ce coût tient à la compilation de ces quelque 7000 lignes
+    de Python, que l'interpréteur évite d'ordinaire en conservant leur
+    bytecode à côté des sources. Lorsque ce n'est pas possible (archive
+    gabctk.com, installation en lecture seule), le bytecode est conservé
+    dans le dossier de cache de l'utilisateur. Python vérifie lui-même que
+    ce bytecode correspond à sa version et aux sources, et recompile
+    celles-ci au besoin.
+    """
+    dossier = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)), 'abc2xml'
+    )
+    if (
+            'abc2xml.abc2xml' not in sys.modules
+            and sys.pycache_prefix is None
+            and not os.access(dossier, os.W_OK)
+    ):
+        sys.pycache_prefix = DOSSIER_CACHE
+        try:
+            from abc2xml import abc2xml  # pylint:disable=C0415
+        finally:
+            sys.pycache_prefix = None
+    from abc2xml import abc2xml  # pylint:disable=C0415,W0404
+    return abc2xml
+
+
 def sortie_verbeuse(debug, gabc, partition):
     """Affichage d'informations de débogage
 
@@ -203,45 +641,43 @@ def sortie_verbeuse(debug, gabc, partition):
 
 
 # pylint:disable=R0913
-def gabctk(entree, opts):
-    """Export dans les différents formats"""
-    transposition = opts.transposition[0] if opts.transposition else None
-    tempo = opts.tempo if opts.tempo is int else TEMPO
+def convertir(entree, opts):
+    """Conversion d'un fichier gabc dans les différents formats
+
+    Rien n'est écrit : renvoie un booléen indiquant si des alertes ont été
+    levées, et la liste des sorties sous forme de couples (fichier, contenu).
+    """
     alertes = False
-    # Extraire le contenu du gabc.
-    try:
-        f_gabc = FichierTexte(entree)
-        gabc = Gabc(f_gabc.contenu)
-        nom = f_gabc.nom
-    # Si le gabc n'existe pas, afficher l'aide.
-    except FileNotFoundError:
-        aide('fichier inexistant', 2)
-    # Extraire la partition.
-    partition = gabc.partition(transposition=transposition)
-    titre = \
-        opts.titre if opts.titre \
-        else gabc.entetes['name'] if 'name' in gabc.entetes \
-        else TITRE
-    sortie_verbeuse(opts.verbose, gabc, partition)
+    sorties = []
+    nom, gabc, partition, titre, tempo = lire_partition(entree, opts)
     # Créer le fichier midi.
     if opts.midi:
-        midi = Midi(partition, titre=titre, tempo=tempo)
-        midi.ecrire(FichierTexte(opts.midi, nom, '.mid').chemin)
+        midi = Midi(
+            partition, titre=titre, tempo=tempo,
+            ticks=opts.ticks,
+            compact=opts.compact
+        )
+        sorties.append((FichierTexte(opts.midi, nom, '.mid'), midi.octets))
     # Créer le fichier lilypond
     if opts.lily:
         lily = Lily(partition, titre=titre, tempo=tempo)
-        lily.ecrire(FichierTexte(opts.lily, nom, '.ly'))
+        sorties.append((FichierTexte(opts.lily, nom, '.ly'), lily.code))
     # Créer le fichier abc
-    if opts.abc or opts.mxml:
+    if opts.abc:
         abc = Abc(partition, titre=titre, tempo=tempo)
-        if opts.abc:
-            abc.ecrire(
-                FichierTexte(opts.abc, nom, '.abc'), abc=True
-            )
-        if opts.mxml:
-            abc.ecrire(
-                FichierTexte(opts.mxml, nom, '.xml'), abc=False, xml=True
-            )
+        sorties.append((FichierTexte(opts.abc, nom, '.abc'), abc.code))
+    # Créer le fichier MusicXML
+    if opts.mxml:
+        fichier = FichierTexte(opts.mxml, nom, '.xml')
+        if opts.abc2xml:
+            # Réglé ici, et non une fois pour toutes, pour valoir aussi
+            # dans les processus de l'option -j.
+            if opts.packrat is not None:
+                charger_abc2xml().enablePackrat(opts.packrat or None)
+            mxml = Abc(partition, titre=titre, tempo=tempo)
+        else:
+            mxml = MusicXML(partition, titre=titre, tempo=tempo)
+        sorties.append((fichier, mxml.octets_pour(fichier)))
     # S'assurer de la présence de certains caractères,
     # à la demande de l'utilisateur.
     # Création d'une variable contenant les paroles.
@@ -252,9 +688,13 @@ def gabctk(entree, opts):
     # Si l'utilisateur l'a demandé,
     # écrire les paroles dans un fichier texte.
     if opts.export:
-        FichierTexte(opts.export).ecrire(paroles + '\n')
+        sorties.append(
+            (FichierTexte(opts.export, nom, '.txt'), paroles + '\n')
+        )
     if opts.musique:
-        FichierTexte(opts.musique).ecrire(partition.gabc)
+        sorties.append(
+            (FichierTexte(opts.musique, nom, '.mus'), partition.gabc)
+        )
     # Si l'utilisateur l'a demandé,
     # écrire une tablature dans un fichier texte.
     if opts.tab:
@@ -265,9 +705,87 @@ def gabctk(entree, opts):
                 zip(partition.syllabes, partition.musique)
             ).replace('\n ', '\n//\n')
         )
-        FichierTexte(opts.tab).ecrire(tablature + '\n')
-    # Code d'erreur si des alertes ont été levées.
-    sys.exit(16 if alertes else 0)
+        sorties.append((FichierTexte(opts.tab, nom, '.tab'), tablature + '\n'))
+    return alertes, sorties
+
+
+def convertir_piece(entree, opts):
+    """Conversion d'un fichier gabc en pièce d'un recueil midi
+
+    Comme convertir, renvoie un booléen indiquant si des alertes ont été
+    levées ; les sorties sont remplacées par le titre et les pistes encodées
+    de la pièce (cf. Midi.pistes), que LivreMidi assemble.
+    """
+    _, _, partition, titre, tempo = lire_partition(entree, opts)
+    midi = Midi(
+        partition, titre=titre, tempo=tempo,
+        ticks=opts.ticks,
+        compact=opts.compact
+    )
+    alertes = bool(opts.alerter) and verifier(opts.alerter, partition.texte)
+    return alertes, (
+        titre, midi.pistes(marqueur=opts.sections)
+    )
+
+
+def jouer(entree, opts):
+    """Lecture en direct d'un fichier gabc (cf. MidiDirect)
+
+    Comme convertir, renvoie un booléen indiquant si des alertes ont été
+    levées, et les sorties : il n'y en a pas, les messages midi étant écrits
+    au fur et à mesure.
+    """
+    f_gabc = FichierTexte(entree)
+    midi = MidiDirect(
+        Gabc(f_gabc.contenu),
+        tempo=opts.tempo[0],
+        transposition=opts.transposition[0] if opts.transposition else None
+    )
+    if opts.midi == '-':
+        sys.stdout.flush()
+        midi.jouer(sys.stdout.buffer)
+    else:
+        with open(opts.midi, 'wb') as tampon:
+            midi.jouer(tampon)
+    alertes = bool(opts.alerter) and verifier(
+        opts.alerter, midi.partition.texte
+    )
+    return alertes, []
+
+
+def lire_partition(entree, opts):
+    """Lecture d'un fichier gabc et de sa partition
+
+    Renvoie le nom du fichier, le gabc, la partition, son titre et son tempo.
+    """
+    transposition = opts.transposition[0] if opts.transposition else None
+    tempo = opts.tempo[0]
+    # Extraire le contenu du gabc.
+    f_gabc = FichierTexte(entree)
+    gabc = Gabc(f_gabc.contenu)
+    # Extraire la partition.
+    partition = gabc.partition(transposition=transposition)
+    titre = \
+        opts.titre if opts.titre \
+        else gabc.entetes['name'] if 'name' in gabc.entetes \
+        else TITRE
+    sortie_verbeuse(opts.verbose, gabc, partition)
+    return f_gabc.nom, gabc, partition, titre, tempo
+
+
+def est_flux(chemin):
+    """Le chemin désigne-t-il un flux, où jouer de la musique en direct ?
+
+    C'est le cas de la sortie standard (-), d'un périphérique (séquenceur
+    midi…) ou d'un tube nommé, mais pas d'un fichier ni d'un dossier.
+    """
+    if chemin == '-':
+        return True
+    try:
+        mode = os.stat(chemin).st_mode
+    except OSError:
+        return False
+    return stat.S_ISCHR(mode) or stat.S_ISFIFO(mode)
 
 
 def verifier(alertes, texte):
@@ -278,7 +796,7 @@ def verifier(alertes, texte):
     for alerte in alertes:
         if alerte in texte:
             n = True
-            sys.stderr.write("!!! " + alerte + " !!!")
+            sys.stderr.write("!!! " + alerte + " !!!\n")
     return n
 
 
@@ -292,17 +810,21 @@ class Gabc:
     def __init__(self, code):
         self.code = code
 
-    @property
+    @cached_property
     def parties(self):
         """Tuple contenant d'une part les en-têtes,
         d'autre part le corps du gabc"""
-        regex = re.compile('%%\r?\n')
-        resultat = regex.split(self.code)
-        return resultat
+        return SEPARATEUR_GABC.split(self.code)
 
-    @property
+    @cached_property
     def entetes(self):
-        """En-têtes du gabc, sous forme d'un dictionnaire"""
+        """En-têtes du gabc, sous forme d'un dictionnaire
+
+        Seule la partie précédant le premier séparateur est lue : le corps du
+        gabc n'est pas traité lorsque l'on n'a besoin que des en-têtes.
+        """
+        separateur = SEPARATEUR_GABC.search(self.code)
+        entetes = self.code[:separateur.start()] if separateur else self.code
         resultat = {
             info[0]: re.sub(
                 '^ +| +$', '',
@@ -310,50 +832,13 @@ class Gabc:
             )
             for info in [
                 ligne.split(':')
-                for ligne in self.parties[0].split('\n')
+                for ligne in entetes.split('\n')
                 if ':' in ligne
                 ]
             }
-        categories = {
-            'alleluia': 'alleluia',
-            'antiphona': 'antiphona',
-            'antienne': 'antiphona',
-            'antiphon': 'antiphona',
-            'communio': 'communio',
-            'communion': 'communio',
-            'graduale': 'graduale',
-            'graduel': 'graduale',
-            'gradual': 'graduale',
-            'hymnus': 'hymnus',
-            'hymne': 'hymnus',
-            'hymn': 'hymnus',
-            'introitus': 'introitus',
-            'introit': 'introitus',
-            'kyriale': 'kyriale',
-            'lectio': 'lectio',
-            'leçon': 'lectio',
-            'lecon': 'lectio',
-            'lesson': 'lectio',
-            'offertorium': 'offertorium',
-            'offertoire': 'offertorium',
-            'offertory': 'offertorium',
-            'responsorium': 'responsorium',
-            'responsum': 'responsorium',
-            'répons': 'responsorium',
-            'repons': 'responsorium',
-            'response': 'responsorium',
-            'sequentia': 'sequentia',
-            'sequence': 'sequentia',
-            'tractus': 'tractus',
-            'trait': 'tractus',
-            'tract': 'tractus',
-            'versus': 'versus',
-            'verset': 'versus',
-            'verse': 'versus',
-            }
         try:
             categorie = sansaccents(resultat['office-part'].lower())
-            if categorie in categories.keys():
+            if categorie in CATEGORIES:
                 resultat['office-part'] = categorie
             else:
                 resultat['office-part'] = 'varia'
@@ -363,7 +848,7 @@ class Gabc:
             resultat['name'] = TITRE
         return resultat
 
-    @property
+    @cached_property
     def contenu(self):
         """Partition gabc sans en-têtes ni commentaires"""
         resultat = self.parties[1]
@@ -373,6 +858,21 @@ class Gabc:
 
     def partition(self, transposition=None):
         """Extraction de la partition à partir du contenu gabc"""
+        partition = Partition(
+            self.entetes['name'], transposition=transposition
+        )
+        for _ in self.mots(partition):
+            pass
+        return partition
+
+    def mots(self, partition):
+        """Analyse du contenu gabc, mot après mot
+
+        Chaque mot est ajouté à la partition, puis renvoyé aussitôt : il peut
+        être traité sans attendre l'analyse des suivants. N.B. : la barre qui
+        suit un mot peut encore allonger sa dernière note (cf.
+        Barre.poser_note_precedente).
+        """
         contenu = self.contenu
         # Signes indiquant les commandes personnalisées (que l'on ignore).
         commandeperso = re.compile(r"\[[^\[^\]]*\]")
@@ -388,9 +888,6 @@ class Gabc:
             nme.replace('(', '').replace(')', '')
             for nme in neume.findall(contenu)
         ]
-        partition = Partition(
-            self.entetes['name'], transposition=transposition
-        )
         reprise = re.compile(r"<i>.*i*j\..*</i>")
         for i, syllabe in enumerate(syllabes):
             rep = reprise.search(syllabe)
@@ -407,6 +904,7 @@ class Gabc:
                         precedent=partition[-1]
                         if len(partition) else None
                     ))
+                    yield partition[-1]
                     mot = []
             except IndexError:
                 partition.append(Mot(
@@ -414,13 +912,42 @@ class Gabc:
                     precedent=partition[-1]
                     if len(partition) else None
                 ))
+                yield partition[-1]
                 mot = []
             mot.append((txt, nme))
         partition.append(Mot(
             gabc=mot,
             precedent=partition[-1]
         ))
-        return partition
+        yield partition[-1]
+
+
+def agregat(methode):
+    """Propriété de Partition calculée une seule fois
+
+    La valeur est conservée jusqu'à la prochaine modification de la
+    partition (cf. Partition.invalider).
+    """
+    nom = methode.__name__
+
+    def propriete(self):
+        try:
+            return self._agregats[nom]
+        except KeyError:
+            valeur = self._agregats[nom] = methode(self)
+            return valeur
+    propriete.__doc__ = methode.__doc__
+    return property(propriete)
+
+
+def invalidant(methode):
+    """Méthode de list modifiant la partition, et donc ses agrégats"""
+    def modification(self, *args, **params):
+        self._agregats.clear()
+        return methode(self, *args, **params)
+    modification.__name__ = methode.__name__
+    modification.__doc__ = methode.__doc__
+    return modification
 
 
 class Partition(list):
@@ -435,6 +962,32 @@ class Partition(list):
         self.titre = titre
         self.tonalite = ['c', 'M']
         self._transposition = transposition
+        # Valeurs calculées à partir des mots : elles sont conservées jusqu'à
+        # la prochaine modification de la partition.
+        self._agregats = {}
+
+    # Toute modification de la liste invalide les agrégats.
+    append = invalidant(list.append)
+    extend = invalidant(list.extend)
+    insert = invalidant(list.insert)
+    pop = invalidant(list.pop)
+    remove = invalidant(list.remove)
+    clear = invalidant(list.clear)
+    sort = invalidant(list.sort)
+    reverse = invalidant(list.reverse)
+    __setitem__ = invalidant(list.__setitem__)
+    __delitem__ = invalidant(list.__delitem__)
+    __iadd__ = invalidant(list.__iadd__)
+    __imul__ = invalidant(list.__imul__)
+
+    def invalider(self):
+        """Oubli des agrégats, à appeler si un mot est modifié sur place"""
+        self._agregats.clear()
+
+    @agregat
+    def colonnes(self):
+        """Représentation en colonnes de la partition (cf. Colonnes)"""
+        return Colonnes(self)
 
     @property
     def gabc(self):
@@ -444,7 +997,7 @@ class Partition(list):
             ' '.join(signe.gabc for signe in self.musique)
         )
 
-    @property
+    @agregat
     def musique(self):
         """Liste de signes musicaux"""
         musique = []
@@ -452,7 +1005,7 @@ class Partition(list):
             musique += mot.musique
         return musique
 
-    @property
+    @agregat
     def syllabes(self):
         """Liste des syllabes des mots de la partition"""
         syllabes = []
@@ -460,18 +1013,13 @@ class Partition(list):
             syllabes += mot
         return syllabes
 
-    @property
+    @agregat
     def tessiture(self):
         """Notes extrêmes de la mélodie"""
-        minimum = maximum = 0
-        # Parcours de toutes les notes de la mélodie, pour déterminer
-        # la plus haute et la plus basse.
-        for neume in self.musique:
-            for note in (notes for notes in neume if isinstance(notes, Note)):
-                if minimum == 0 or note.hauteur < minimum:
-                    minimum = note.hauteur
-                if note.hauteur > maximum:
-                    maximum = note.hauteur
+        # Les signes qui ne sont pas des notes ont une hauteur nulle.
+        hauteurs = self.colonnes.hauteurs
+        minimum = min(filter(None, hauteurs), default=0)
+        maximum = max(hauteurs, default=0)
         if self._transposition:
             minimum += self._transposition
             maximum += self._transposition
@@ -482,7 +1030,7 @@ class Partition(list):
         """Texte de la partition"""
         return ' '.join(str(mot) for mot in self)
 
-    @property
+    @agregat
     def transposition(self):
         """Transposition automatique de la partition si besoin"""
         if self._transposition is not None:
@@ -492,6 +1040,46 @@ class Partition(list):
             return 66 - int(sum(self.tessiture.values())/2)
 
 
+class Contexte:  # pylint:disable=R0903
+    """Contexte de l'analyse d'une partition
+
+    Il porte ce qui, au fil de la lecture du gabc, vaut pour les signes
+    suivants : clef courante, altérations en vigueur dans le mot en cours,
+    dernière syllabe et dernière note lues. Chaque partition a le sien.
+
+    """
+    def __init__(self):
+        self.cle = None
+        self.alterations = {}
+        self.dernieresyllabe = None
+        self.derniere_note = None
+        # Table des hauteurs pour la clef et les altérations en vigueur.
+        self.hauteurs = None
+
+    def changer_cle(self, cle):
+        """Prise en compte d'une nouvelle clef"""
+        self.cle = cle
+        self.actualiser()
+
+    def alterer(self, lettre, alteration):
+        """Prise en compte d'une altération (-1, 0 ou 1)"""
+        self.alterations[lettre] = alteration
+        self.actualiser()
+
+    def nouveau_mot(self):
+        """Les altérations ne valent que jusqu'à la fin du mot"""
+        if self.alterations:
+            self.alterations = {}
+            self.actualiser()
+
+    def actualiser(self):
+        """Sélection de la table des hauteurs"""
+        if self.cle is not None:
+            self.hauteurs = hauteurs_gabc(
+                self.cle.gabc, tuple(sorted(self.alterations.items()))
+            )
+
+
 class ObjetLie:  # pylint:disable=R0903
     """Objet lié au précédent
 
@@ -500,25 +1088,13 @@ class ObjetLie:  # pylint:disable=R0903
     certaines opérations rétroactives.
 
     """
+    # Les attributs sont déclarés dans les classes dérivées (__slots__).
+    __slots__ = ()
+
     def __init__(self, precedent):
         self._precedent = None
         self.precedent = precedent
 
-    def __getattr__(self, attribut):
-        try:
-            return getattr(self.precedent, attribut)
-        except AttributeError:
-            raise
-
-    def __setattr__(self, attribut, valeur):
-        try:
-            object.__setattr__(self, attribut, valeur)
-        except AttributeError:
-            try:
-                setattr(self.precedent, attribut, valeur)
-            except AttributeError:
-                raise
-
     @property
     def precedent(self):
         """Renvoie la référence à l'objet précédent"""
@@ -541,21 +1117,25 @@ class Mot(ObjetLie, list):
     - d'une liste de tuples (syllabe, musique) en langage gabc.
 
     """
+    __slots__ = ('_precedent', 'suivant', 'contexte')
+
     def __init__(self, gabc=None, precedent=None, *args, **params):
         ObjetLie.__init__(self, precedent=precedent)
         list.__init__(self, *args, **params)
+        # Le contexte est partagé par tous les mots d'une même partition ;
+        # les altérations ne valent que jusqu'à la fin du mot.
+        self.contexte = (
+            precedent.contexte if precedent is not None else Contexte()
+        )
+        self.contexte.nouveau_mot()
         if gabc:
             for syl in gabc:
                 self.append(Syllabe(
                     gabc=syl,
                     mot=self,
-                    precedent=(
-                        self[-1] if len(self)
-                        else self.precedent.dernieresyllabe if self.precedent
-                        else None
-                    )
+                    precedent=self.contexte.dernieresyllabe
                 ))
-            self.dernieresyllabe = self[-1]
+                self.contexte.dernieresyllabe = self[-1]
 
     def __repr__(self):
         return str(self)
@@ -576,21 +1156,16 @@ class Syllabe(ObjetLie):
     en langage gabc.
 
     """
+    __slots__ = ('_precedent', 'suivant', 'mot', 'texte', 'neume', 'ly_texte')
+
     def __init__(self, gabc, mot=None, precedent=None):
         ObjetLie.__init__(self, precedent=precedent)
         self.mot = mot
         self.texte = gabc[0]
-        if len(mot):
-            try:
-                alterations = precedent.musique[-1].alterations
-            except AttributeError:
-                alterations = None
-        else:
-            alterations = None
         self.neume = Neume(
             gabc=gabc[1],
             syllabe=self,
-            alterations=alterations
+            contexte=mot.contexte
         )
         # Lilypond ne peut pas associer une syllabe à un "neume" sans note.
         # Il est donc nécessaire de traiter à part le texte pour lui.
@@ -652,29 +1227,17 @@ class Syllabe(ObjetLie):
             .replace("<sp>'Œ</sp>", 'Œ́')
 
     @property
-    def abc(self):
-        """Texte de la syllabe adapté pour abc"""
-        abc_texte = self.texte
-        try:
-            if abc_texte[0] == ' ':
-                abc_texte = abc_texte[1:]
-        except IndexError:
-            pass
+    def paroles(self):
+        """Texte de la syllabe tel qu'il est chanté (abc, MusicXML)"""
+        texte = self.texte
+        if texte[:1] == ' ':
+            texte = texte[1:]
         special = re.compile(re.escape('<v>') + '.*' + re.escape('</v>'))
-        if special.search(abc_texte):
-            abc_texte = special.sub('', abc_texte)
-        if (
-                not len(abc_texte)
-                and not (
-                    len(self.neume) == 1
-                    and isinstance(self.neume[0], Clef)
-                )
-        ):
-            abc_texte = ''
-        abc_texte = abc_texte.replace(' ', '~')
-        return abc_texte\
+        if special.search(texte):
+            texte = special.sub('', texte)
+        return texte\
             .replace('-', '')\
-            .replace('*', '~✶').replace('~~', '~')\
+            .replace('*', ' ✶').replace('  ', ' ')\
             .replace('<i>', '').replace('</i>', '')\
             .replace('<b>', '').replace('</b>', '')\
             .replace('{', '').replace('}', '')\
@@ -693,6 +1256,11 @@ class Syllabe(ObjetLie):
             .replace("<sp>'OE</sp>", 'Œ́')\
             .replace("<sp>'Œ</sp>", 'Œ́')
 
+    @property
+    def abc(self):
+        """Texte de la syllabe adapté pour abc"""
+        return self.paroles.replace(' ', '~')
+
     @property
     def musique(self):
         """Liste des notes associées à la syllabe"""
@@ -701,14 +1269,19 @@ class Syllabe(ObjetLie):
 
 class Neume(list):
     """Ensemble de signes musicaux"""
+    __slots__ = (
+        'syllabe', 'contexte', 'element_ferme', 'possede_note', 'derniere_note'
+    )
+
     def __init__(
-            self, gabc=None, syllabe=None, alterations=None, *args, **params
+            self, gabc=None, syllabe=None, contexte=None, *args, **params
     ):
         list.__init__(self, *args, **params)
         self.syllabe = syllabe
+        self.contexte = contexte
         self.element_ferme = True
         self.possede_note = False
-        self.alterations = alterations
+        self.derniere_note = None
         self.traiter_gabc(gabc)
 
     @property
@@ -731,54 +1304,17 @@ class Neume(list):
         return ''.join(signe.abc for signe in self)
 
     def traiter_gabc(self, gabc):
-        """Extraction des signes à partir du code gabc"""
-        # Expression correspondant aux clés.
-        cle = re.compile('[cf][b]?[1234]')
-        # Ce dictionnaire renvoie l'objet correspondant à chaque signe.
-        signes = {
-            Note:           re.compile("[abcdefghijklmABCDEFGHIJKLM]"),
-            SigneRythmique: re.compile("[_.'w~]"),
-            NoteSpeciale:   re.compile("[osvOSV]"),
-            Barre:          re.compile("[`,;:]"),
-            Alteration:     re.compile("[xy#]"),
-            Coupure:        re.compile("[/ ]"),
-            Custo:          re.compile(r"\+"),
-            Fin:            re.compile("z"),
-            Cesure:         re.compile("!"),
-        }
-        if cle.search(gabc) and cle.fullmatch(gabc):
-            # Traitement d'une clef toute simple (initiale)
-            self.append(Clef(
-                gabc=gabc,
-                neume=self,
-            ))
-        elif cle.search(gabc):
-            # Traitement des changements de clef
-            clef = cle.findall(gabc)[0]
-            autres = cle.split(gabc)
-            for sgn in autres[0]:
-                self.traiter_gabc(sgn)
-            self.append(Clef(
-                gabc=clef,
+        """Extraction des signes à partir du code gabc
+
+        Le code est parcouru une seule fois : chaque signe reconnu par
+        SIGNES_GABC est directement transformé en l'objet correspondant.
+        """
+        for signe in SIGNES_GABC.finditer(gabc):
+            self.append(TYPES_SIGNES[signe.lastgroup](
+                gabc=signe.group(),
                 neume=self,
+                precedent=self[-1] if len(self) else None,
             ))
-            for sgn in autres[1]:
-                self.traiter_gabc(sgn)
-        else:
-            for signe in gabc:
-                for typesigne, regex in signes.items():
-                    if regex.fullmatch(signe):
-                        try:
-                            alterations = self.alterations
-                        except AttributeError:
-                            alterations = None
-                        self.append(typesigne(
-                            gabc=signe,
-                            neume=self,
-                            precedent=self[-1] if len(self)
-                            else None,
-                            alterations=alterations
-                        ))
         for signe in self:
             if isinstance(signe, Note):
                 signe.ouvrir_neume()
@@ -787,6 +1323,8 @@ class Neume(list):
             if isinstance(signe, Note):
                 signe.fermer_neume()
                 break
+        for signe in self:
+            signe.figer()
 
 
 class Signe(ObjetLie):
@@ -794,21 +1332,24 @@ class Signe(ObjetLie):
 
     Il peut s'agir d'une note, d'un épisème, d'une barre…
 
+    Les signes étant très nombreux dans une partition, leurs attributs sont
+    déclarés dans __slots__ (de même dans les classes dérivées), ce qui évite
+    un dictionnaire par instance.
+
     """
+    __slots__ = ('_precedent', 'suivant', 'gabc', 'neume', '_ly', '_abc')
+
     def __init__(
             self,
             gabc,
             neume=None,
             precedent=None,
-            suivant=None,
-            alterations=None
+            suivant=None
     ):
         ObjetLie.__init__(self, precedent=precedent)
         self.gabc = gabc
         self.neume = neume
         self.suivant = suivant
-        if alterations:
-            self.alterations = alterations
         self._ly = ''
         self._abc = ''
 
@@ -840,6 +1381,15 @@ class Signe(ObjetLie):
         """'Setter' pour l'expression abc"""
         self._abc = valeur
 
+    def figer(self):
+        """Partage des codes ly et abc entre signes identiques
+
+        Appelée lorsque le neume est complet, et que ces codes ne changeront
+        donc plus.
+        """
+        self._ly = sys.intern(self._ly)
+        self._abc = sys.intern(self._abc)
+
     def __repr__(self):
         return str(type(self).__name__) + ' : ' + self.gabc
 
@@ -848,49 +1398,35 @@ class Signe(ObjetLie):
 
 
 class Alteration(Signe):
-    """Bémols et bécarres"""
-    def __init__(self, gabc, **params):
-        Signe.__init__(self, gabc, **params)
-        self.gabc = self.precedent.gabc + gabc
-        if self.precedent.premier_element:
-            self.neume.element_ferme = True
-        self.precedent = self.precedent.precedent
-        self.neume.pop()
+    """Bémols et bécarres
 
-    @property
-    def alterations(self):
-        """Liste des altérations
+    Ils valent pour les notes suivantes jusqu'à la fin du mot : les altérations
+    en vigueur sont enregistrées dans le contexte, où les notes marquées
+    d'un bémol sont associées à la valeur -1, marquées d'un dièze à 1.
+    """
+    __slots__ = ()
 
-        Sous forme d'un dictionnaire, où les notes marquées d'un bémol sont
-        associées à la valeur -1, marquées d'un dièze à 1, les autres à 0.
-        """
-        try:
-            alterations = self.precedent.alterations
-        except AttributeError:
-            alterations = {
-                chr(lettre): 0 for lettre in range(ord('a'), ord('p') + 1)
-            }
-        alterations[self.gabc[0]] = {'x': -1, 'y': 0, '#': 1}[self.gabc[1]]
-        return alterations
+    def __init__(self, gabc, **params):
+        Signe.__init__(self, gabc, **params)
+        self.neume.contexte.alterer(
+            self.gabc[0].lower(), {'x': -1, 'y': 0, '#': 1}[self.gabc[1]]
+        )
 
 
 class Barre(Signe):
     """Barres délimitant les incises"""
+    __slots__ = ()
+
     def __init__(self, gabc, **params):
         Signe.__init__(self, gabc, **params)
         if isinstance(self.precedent, Barre):
-            if self.precedent.gabc == ':' and self.gabc == ':':
-                self.gabc = self.precedent.gabc + gabc
-                self.precedent = self.precedent.precedent
-                self.neume.pop()
-            else:
-                raise ErreurSyntaxe('Double barre bizarre')
+            raise ErreurSyntaxe('Double barre bizarre')
         try:
-            self.precedent.duree_egaliser()
+            self.neume.derniere_note.duree_egaliser()
         except AttributeError:
             pass
         try:
-            self.precedent.fermer_element()
+            self.neume.derniere_note.fermer_element()
         except AttributeError:
             pass
         self.poser_note_precedente()
@@ -900,7 +1436,10 @@ class Barre(Signe):
         pass
 
     def poser_note_precedente(self):
-        """Augmente la durée de la note précédente"""
+        """Augmente la durée de la note précédente
+
+        Seule la première barre suivant une note l'allonge.
+        """
         pose = {
             "`": 0,
             ",": 0,
@@ -908,16 +1447,17 @@ class Barre(Signe):
             ":": 1,
             "::": 1.2,
         }[self.gabc]
-        try:
-            self.precedent.poser(pose)
-        except AttributeError:
-            self.neume.syllabe.mot.precedent[-1].neume[-1].poser(pose)
+        contexte = self.neume.contexte
+        if contexte.derniere_note is not None:
+            contexte.derniere_note.poser(pose)
+            contexte.derniere_note = None
 
     @property
     def ly(self):
         """Correspondance entre les barres gabc et les barres lilypond"""
         return ''' \\bar "{}"'''.format({
             '': "",
+            '`': "'",
             ',': "'",
             ';': "'",
             ':': "|",
@@ -929,6 +1469,7 @@ class Barre(Signe):
         """Correspondance entre les barres gabc et les barres abc"""
         return {
             '': "",
+            '`': "!shortphrase![|]",
             ',': "!shortphrase![|]",
             ';': "!mediumphrase![|]",
             ':': "|",
@@ -938,9 +1479,11 @@ class Barre(Signe):
 
 class Clef(Signe):
     """Clefs"""
+    __slots__ = ()
+
     def __init__(self, gabc, **params):
         Signe.__init__(self, gabc, **params)
-        self.neume.syllabe.mot.cle = self
+        self.neume.contexte.changer_cle(self)
 
 
 class Fin(Signe):
@@ -949,6 +1492,8 @@ class Fin(Signe):
     Il signifie ou bien une fin de ligne forcée, ou bien un guidon automatique
     en fin de ligne.
     """
+    __slots__ = ()
+
     def __init__(self, gabc, **params):
         Signe.__init__(self, gabc, **params)
 
@@ -958,22 +1503,24 @@ class Custo(Signe):
 
     Il indique quelle est la note suivante.
     """
+    __slots__ = ()
+
     def __init__(self, gabc, **params):
         Signe.__init__(self, gabc, **params)
-        self.precedent = self.precedent.precedent
-        self.neume.pop()
 
 
 class Coupure(Signe):
     """Coupures neumatiques"""
+    __slots__ = ()
+
     def __init__(self, gabc, **params):
         Signe.__init__(self, gabc, **params)
         try:
-            self.precedent.duree_egaliser()
+            self.neume.derniere_note.duree_egaliser()
         except AttributeError:
             pass
         try:
-            self.precedent.fermer_element()
+            self.neume.derniere_note.fermer_element()
         except AttributeError:
             pass
 
@@ -986,15 +1533,17 @@ class Coupure(Signe):
 
 class Cesure(Signe):
     """Césures neumatiques (symbole !)"""
-    pass
+    __slots__ = ()
 
 
 class SigneRythmique(Signe):
     """Épisèmes, points"""
+    __slots__ = ()
+
     def __init__(self, gabc, **params):
         Signe.__init__(self, gabc, **params)
         try:
-            self.precedent.appliquer({
+            self.neume.derniere_note.appliquer({
                 "'": 'ictus',
                 '_': 'episeme',
                 '.': 'point',
@@ -1007,54 +1556,70 @@ class SigneRythmique(Signe):
 
 class Note(Signe):
     """Note de musique"""
+    __slots__ = (
+        'note_precedente', 'hauteur', 'duree', '_nuances', 'premier_element',
+        'fin_element'
+    )
+
     def __init__(self, gabc, **params):
         Signe.__init__(
             self,
             gabc=gabc,
             **params
         )
+        # Note précédente dans le neume, à laquelle s'appliquent
+        # certains signes (quilisma, points multiples…).
+        self.note_precedente = self.neume.derniere_note
         self.hauteur = self.g2mid()
         # Par défaut, la durée est à 1 : elle pourra être modifiée par
         # la suite, s'il se rencontre un épisème, un point, etc.
         self.duree = 1
         self._ly = self.g2ly()
         self._abc = self.g2abc()
-        self._nuances = []
+        self._nuances = 0
+        self.fin_element = False
         self.neume.possede_note = True
         if self.neume.element_ferme:
             self.ouvrir_element()
             self.premier_element = True
         else:
             self.premier_element = False
+        self.neume.derniere_note = self.neume.contexte.derniere_note = self
 
     def duree_egaliser(self):
         """Rend la durée de la note au moins égale à celle de la précédente"""
         try:
-            if self.duree < self.precedent.duree:
-                self.duree = self.precedent.duree
+            if self.duree < self.note_precedente.duree:
+                self.duree = self.note_precedente.duree
         except AttributeError:
             pass
 
     def appliquer(self, nuance):
         """Prise en compte des divers signes rythmiques"""
-        if nuance not in self._nuances:
-            self._nuances.append(nuance)
+        drapeau = NUANCES[nuance]
+        if not self._nuances & drapeau:
+            self._nuances |= drapeau
             if nuance == 'episeme':
                 self.retenir(DUREE_EPISEME)
             elif nuance == 'point':
                 self.retenir(DUREE_POINT)
                 self.fermer_element()
                 try:
-                    self.precedent.fermer_element()
+                    self.note_precedente.fermer_element()
                 except AttributeError:
                     pass
             elif nuance == 'quilisma':
-                self.precedent.retenir(DUREE_AVANT_QUILISMA)
+                self.note_precedente.retenir(DUREE_AVANT_QUILISMA)
         else:
             if nuance in ('quilisma', 'liquescence'):
                 raise ErreurSyntaxe('Deux {}s consécutifs.'.format(nuance))
             else:
-                self.precedent.appliquer(nuance)
+                self.note_precedente.appliquer(nuance)
+
+    @property
+    def nuances(self):
+        """Nuances rythmiques de la note, combinées en un entier"""
+        return self._nuances
 
     def poser(self, pose):
         """Appliquer le posé réclamé par la barre suivante"""
@@ -1069,32 +1634,32 @@ class Note(Signe):
     def ly(self):
         # pylint:disable=C0103
         ly = ' ' + self._ly
-        if 'point' in self._nuances:
+        if self._nuances & POINT:
             ly = ly.replace('8', '4')
-        if 'episeme' in self._nuances:
+        if self._nuances & EPISEME:
             ly += '--'
-        if 'ictus' in self._nuances:
+        if self._nuances & ICTUS:
             ly += '-!'
-        if 'quilisma' in self._nuances:
+        if self._nuances & QUILISMA:
             ly += '\\prall'
-        if 'liquescence' in self._nuances:
+        if self._nuances & LIQUESCENCE:
             ly = ' \\tiny{} \\normalsize'.format(ly)
         return ly
 
     @property
     def abc(self):
         abc = self._abc
-        if 'point' in self._nuances:
+        if self._nuances & POINT:
             while abc[-1] == ' ':
                 abc = abc[:-1]
             abc = abc + '2'
-        if 'episeme' in self._nuances:
+        if self._nuances & EPISEME:
             abc = '!tenuto!' + abc
-        if 'ictus' in self._nuances:
+        if self._nuances & ICTUS:
             abc = '!wedge!' + abc
-        if 'quilisma' in self._nuances:
+        if self._nuances & QUILISMA:
             abc = 'P' + abc
-        if 'liquescence' in self._nuances:
+        if self._nuances & LIQUESCENCE:
             pass
         return abc
 
@@ -1111,8 +1676,9 @@ class Note(Signe):
 
         Ceci est surtout nécessaire pour lilypond
         """
+        self.fin_element = True
         self._abc += ' '
-        if 'point' in self._nuances:
+        if self._nuances & POINT:
             self._ly = self._ly.replace('[', '')
         else:
             self._ly = (self._ly + ']').replace('[]', '')
@@ -1137,164 +1703,116 @@ class Note(Signe):
     @property
     def note(self):
         """Renvoi du nom "canonique" de la note"""
-        octve = int(self.hauteur / 12) - 2
-        nte = int(self.hauteur % 12)
-        return ('Do',
-                'Do#',
-                'Ré',
-                'Mib',
-                'Mi',
-                'Fa',
-                'Fa#',
-                'Sol',
-                'Sol#',
-                'La',
-                'Sib',
-                'Si')[nte] + str(octve)
+        return NOMS_NOTES[self.hauteur % 12] + str(self.hauteur // 12 - 2)
 
     def g2ly(self):
         """Renvoi du code lilypond correspondant à la note"""
-        octve = int(self.hauteur / 12) - 1
-        nte = int(self.hauteur % 12)
-        # Nom de la note
-        note = ('c',
-                'cis',
-                'd',
-                'ees',
-                'e',
-                'f',
-                'fis',
-                'g',
-                'gis',
-                'a',
-                'bes',
-                'b')[nte]
-        # Hauteur de la note :
-        # on prévoit de la1 à sol7, ce qui est plutôt large !
-        note += (", , ",
-                 ", ",
-                 "",
-                 "'",
-                 "''",
-                 "'''",
-                 "''''")[octve-1]
-        # Durée de la note : croche par défaut, pourra être précisée
-        # par la suite.
-        note += '8'
-        return note
+        # Nom et hauteur de la note ; durée : croche par défaut, pourra être
+        # précisée par la suite.
+        return (
+            NOTES_LY[self.hauteur % 12]
+            + OCTAVES_LY[self.hauteur // 12 - 2]
+            + '8'
+        )
 
     def g2abc(self):
         """Renvoi du code abc correspondant à la note"""
-        # Nom de la note
-        return (
-            'A,', '_B' 'B,',
-            'C', '_D', 'D', '_E', 'E', 'F', '_G', 'G', '_A', 'A', '_B', 'B',
-            'c', '_d', 'd', '_e', 'e', 'f', '_g', 'g', '_a', 'a', '_b', 'b',
-            "c'", "_d'", "d'", "_e'", "e'", "f'", "_g'", "g'", "_a'", "a'"
-        )[self.hauteur - 58]
+        return NOTES_ABC[self.hauteur - H_LA]
 
     def g2mid(self, gabc=None):
         """Renvoi de la note correspondant à une lettre gabc"""
         if not gabc:
             gabc = self.gabc
-        # Définition de la gamme.
-        h_la = H_LA
-        gamme = {
-            'notes': ('la', 'si', 'do', 're', 'mi', 'fa', 'sol'),
-            'hauteurs': (
-                h_la,
-                h_la + 2,
-                h_la + 3,
-                h_la + 5,
-                h_la + 7,
-                h_la + 8,
-                h_la + 10
-            ),
-        }
-        gabcnotes = "abcdefghijklm"
-        # Analyse de la clé : les lettres du gabc définissant une
-        # position sur la portée et non une hauteur de note, la note
-        # correspondant à une lettre dépend de la clé.
-        # N.B : c1, f1 et f2 n'existent pas normalement, mais cela ne
-        # nous regarde pas !
-        cle = self.neume.syllabe.mot.cle.gabc
-        alterations = {
-            chr(lettre): 0 for lettre in range(ord('a'), ord('p') + 1)
-        }
-        try:
-            alterations = self.alterations if self.alterations else alterations
-        except AttributeError:
-            pass
-        # Traitement des bémols à la clé.
-        if len(cle) == 3:
-            cle = cle[0] + cle[2]
-            alterations[{
-                "c4": 'bi',
-                "c3": 'g',
-                "c2": 'el',
-                "c1": 'cj',
-                "f4": 'fm',
-                "f3": 'dk',
-                "f2": 'bi',
-                "f1": 'g'
-            }[cle]] = -1
-        decalage = {
-            "c4": 0,
-            "c3": 2,
-            "c2": 4,
-            "c1": 6,
-            "f4": 3,
-            "f3": 5,
-            "f2": 0,
-            "f1": 2
-        }
-        i = decalage[cle] - 1
-        octve = -12 if cle == 'f3' else 0
-        hauteurs = {}
-        notes = {}
-        for j in gabcnotes:
-            i += 1
-            if i == 7:
-                i %= 7
-                octve += 12
-            notes[j] = gamme['notes'][i]
-            hauteurs[j] = gamme['hauteurs'][i] + octve
-        lettre = gabc.lower()[0]
-        hauteur = hauteurs[lettre]
-        hauteur += alterations[lettre]
-        # Si la note est altérée par un bémol, l'abaisser d'un demi-ton.
-        # N.B : le grégorien n'admet que le si bémol, mais il n'y avait
-        # pas de raison de se limiter à ce dernier. Cependant, on
-        # renvoie un avertissement si un autre bémol est rencontré, car
-        # il peut s'agir d'une erreur.
-        if alterations[lettre] == -1 and notes[lettre] != 'si':
-            sys.stderr.write(notes[lettre] + ' bémol rencontré')
+        hauteurs = self.neume.contexte.hauteurs
+        if hauteurs is None:
+            raise ErreurSyntaxe('note ' + gabc + ' avant toute clef')
+        hauteur, avertissement = hauteurs[gabc.lower()[0]]
+        if avertissement:
+            sys.stderr.write(avertissement)
         return hauteur
 
 
 class NoteSpeciale(Note):
     """Notes répercutantes
 
-    Virga, oriscus, stropha.
+    Virga, oriscus, stropha. Le signe suit la lettre de la note (hv), ou
+    répercute seul la note spéciale précédente (hvv, hsss).
 
     """
+    __slots__ = ('lettre',)
+
     def __init__(self, gabc, precedent, **params):
-        Note.__init__(self, gabc=precedent.gabc, precedent=precedent, **params)
-        if isinstance(precedent, NoteSpeciale):
-            self.gabc = gabc
-        elif isinstance(precedent, Note):
-            self.gabc = self.precedent.gabc + gabc
-            if precedent.premier_element:
-                self.ouvrir_element()
-            self.precedent = precedent.precedent
-            self.neume.pop()
+        if len(gabc) > 1:
+            lettre = gabc[0]
+        elif isinstance(precedent, NoteSpeciale):
+            lettre = precedent.lettre
         else:
             raise ErreurSyntaxe(gabc + ' sans note précédente')
+        Note.__init__(
+            self, gabc=lettre + gabc[-1], precedent=precedent, **params
+        )
+        self.gabc = gabc
+        self.lettre = lettre
 
     def retenir(self, duree):
         Note.retenir(self, duree)
 
 
+# Correspondance entre les groupes de SIGNES_GABC et les classes de signes.
+TYPES_SIGNES = {
+    typesigne.__name__: typesigne for typesigne in (
+        Clef, Alteration, Custo, NoteSpeciale, Note,
+        SigneRythmique, Barre, Coupure, Fin, Cesure,
+    )
+}
+
+
+class Colonnes:  # pylint:disable=R0903
+    """Représentation en colonnes d'une partition
+
+    Chaque signe de la partition correspond à une ligne de tableaux parallèles
+    (cf. module array) :
+
+    − hauteurs : hauteur MIDI, nulle pour les signes qui ne sont pas des notes ;
+    − durees : durée, nulle pour les signes qui ne sont pas des notes ;
+    − nuances : nuances rythmiques (cf. NUANCES) ;
+    − syllabes : indice de la syllabe dans Partition.syllabes ;
+    − mots : indice du mot dans la partition ;
+    − types : type de signe, indice dans Colonnes.TYPES.
+
+    Construite en un seul parcours de la partition, elle permet ensuite des
+    calculs portant sur la partition entière sans en parcourir les objets.
+    """
+    TYPES = tuple(TYPES_SIGNES.values())
+
+    def __init__(self, partition):
+        self.hauteurs = array('B')
+        self.durees = array('d')
+        self.nuances = array('B')
+        self.syllabes = array('L')
+        self.mots = array('L')
+        self.types = array('B')
+        codes = {typesigne: i for i, typesigne in enumerate(Colonnes.TYPES)}
+        i_syllabe = 0
+        for i_mot, mot in enumerate(partition):
+            for syllabe in mot:
+                for signe in syllabe.musique:
+                    if isinstance(signe, Note):
+                        self.hauteurs.append(signe.hauteur)
+                        self.durees.append(signe.duree)
+                        self.nuances.append(signe.nuances)
+                    else:
+                        self.hauteurs.append(0)
+                        self.durees.append(0)
+                        self.nuances.append(0)
+                    self.syllabes.append(i_syllabe)
+                    self.mots.append(i_mot)
+                    self.types.append(codes[type(signe)])
+                i_syllabe += 1
+
+    def __len__(self):
+        return len(self.types)
+
 # # Classes servant à l'export en différents formats.
 
 
@@ -1331,15 +1849,20 @@ class Lily:
                 musique += '%{}\n'.format(i) + notes + '\n'
         return texte, musique
 
-    def ecrire(self, fichier):
-        """Enregistrement du code lilypond dans un fichier"""
-        fichier.ecrire(LILYPOND_ENTETE % {
+    @property
+    def code(self):
+        """Code lilypond complet"""
+        return LILYPOND_ENTETE % {
             'titre': self.titre,
             'tonalite': self.tonalite,
             'musique': self.musique,
             'transposition': self.transposition,
             'paroles': self.texte
-        })
+        }
+
+    def ecrire(self, fichier):
+        """Enregistrement du code lilypond dans un fichier"""
+        fichier.ecrire(self.code)
 
 
 class Abc:
@@ -1349,7 +1872,6 @@ class Abc:
         self.texte, self.musique = self.traiter_partition(partition)
         self.titre = titre
         self.tempo = tempo / 2
-        self.texte, self.musique = self.traiter_partition(partition)
         self.code = ABC_ENTETE % {
             'titre': self.titre,
             'tonalite': self.tonalite,
@@ -1387,88 +1909,711 @@ class Abc:
             musique += ' '
         return texte, musique[:-3] + '|]'
 
+    @property
+    def xml(self):
+        """Code MusicXML, obtenu par conversion du code abc
+
+        Chaque conversion a sa propre instance de MusicXml, qui garde tout
+        son état et ses messages de diagnostic : plusieurs partitions
+        peuvent ainsi être converties en même temps par des threads.
+        """
+        abc2xml = charger_abc2xml()
+        return abc2xml.fixDoctype(
+            abc2xml.MusicXml().parse(self.code, False, False, False)
+        )
+
+    @property
+    def octets(self):
+        """Code MusicXML sérialisé en UTF-8, sans passer par un fichier"""
+        return self.xml.encode('utf-8')
+
+    def ecrire_tampon(self, tampon):
+        """Écriture du code MusicXML dans un tampon binaire
+
+        Le tampon peut être tout objet doté d'une méthode write acceptant
+        des octets : fichier ouvert en 'wb', io.BytesIO, socket.makefile…
+        """
+        tampon.write(self.octets)
+
+    def octets_pour(self, fichier):
+        """Code MusicXML tel qu'il doit être écrit dans ce fichier
+
+        Sur la sortie standard, il est suivi d'un saut de ligne.
+        """
+        return self.octets + (b'\n' if fichier.chemin == '-' else b'')
+
     def ecrire(self, fichier, abc=True, xml=False):
         """Écriture effective du fichier abc"""
         if abc:
             fichier.ecrire(self.code)
         if xml:
-            dossier, fichier = os.path.split(fichier.chemin)
-            fichier = '' if fichier == '-' else fichier
-            if fichier and not dossier:
-                dossier = '.'
-            abc2xml.convert(
-                dossier, fichier[:-4], self.code, False, False, False
-            )
+            fichier.ecrire(self.octets_pour(fichier))
 
 
-class MusicXML(Abc):
-    """Classe encapsulant la classe Abc pour produire du MusicXML"""
+class MusicXML:
+    """Partition MusicXML
+
+    Le code est produit directement à partir de la partition, sans passer
+    par abc2xml (cf. Abc.xml) : le contenu musical est le même, mais l'on
+    fait l'économie de l'analyse du code abc par pyparsing.
+    """
     def __init__(self, partition, titre, tempo):
-        Abc.__init__(self, partition, titre, tempo)
+        self.partition = partition
+        self.titre = titre
+        self.tempo = tempo
+
+    @property
+    def code(self):
+        """Code MusicXML complet"""
+        return ''.join(self.elements())
+
+    @property
+    def octets(self):
+        """Code MusicXML sérialisé en UTF-8, sans passer par un fichier"""
+        tampon = io.BytesIO()
+        self.ecrire_tampon(tampon)
+        return tampon.getvalue()
+
+    def ecrire_tampon(self, tampon):
+        """Écriture du code MusicXML dans un tampon binaire
+
+        Le tampon peut être tout objet doté d'une méthode write acceptant
+        des octets : fichier ouvert en 'wb', io.BytesIO, socket.makefile…
+        Le code y est envoyé au fur et à mesure de sa production, sans être
+        d'abord assemblé en mémoire.
+        """
+        for element in self.elements():
+            tampon.write(element.encode('utf-8'))
+
+    def octets_pour(self, fichier):
+        """Code MusicXML tel qu'il doit être écrit dans ce fichier
+
+        Sur la sortie standard, il est suivi d'un saut de ligne.
+        """
+        return self.octets + (b'\n' if fichier.chemin == '-' else b'')
 
     def ecrire(self, fichier):
-        Abc.ecrire(self, fichier, abc=False, xml=True)
+        """Écriture effective du fichier MusicXML"""
+        fichier.ecrire(self.octets_pour(fichier))
+
+    def elements(self):
+        """Code MusicXML, produit au fil de la partition
+
+        L'en-tête, chaque note et chaque changement de mesure sont renvoyés
+        l'un après l'autre.
+        """
+        yield MXML_ENTETE % {
+            'titre': escape(str(self.titre), quote=False),
+            'date': date.today().isoformat(),
+            'transposition': self.partition.transposition,
+        }
+        mesure = 1
+        alterations = set()
+        for element in self.traiter_partition(self.partition):
+            if isinstance(element, str):
+                mesure += 1
+                alterations.clear()
+                yield (
+                    (MXML_BARRE % element if element else '')
+                    + MXML_MESURE % mesure
+                )
+            else:
+                yield self.note(*element, alterations)
+        yield MXML_BARRE % 'light-heavy' + MXML_PIED
+
+    @staticmethod
+    def note(  # pylint:disable=R0913
+            note, poutre, parole, extension, alterations
+    ):
+        """Élément <note>
+
+        alterations contient les notes altérées dans la mesure courante.
+        """
+        etape, bemol = MXML_HAUTEURS[note.hauteur % 12]
+        octave = note.hauteur // 12 - 1
+        code = MXML_NOTE % (
+            etape,
+            '          <alter>-1</alter>\n' if bemol else '',
+            octave,
+            MXML_NOIRE if note.nuances & POINT else MXML_CROCHE,
+        )
+        # Comme en abc, toute note altérée porte son altération ; un bécarre
+        # est affiché si la note a été altérée plus tôt dans la mesure.
+        if bemol:
+            alterations.add((etape, octave))
+            code += '        <accidental>flat</accidental>\n'
+        elif (etape, octave) in alterations:
+            alterations.remove((etape, octave))
+            code += '        <accidental>natural</accidental>\n'
+        if poutre:
+            code += '        <beam number="1">' + poutre + '</beam>\n'
+        if note.nuances & (QUILISMA | ICTUS | EPISEME):
+            code += '        <notations>\n'
+            if note.nuances & QUILISMA:
+                code += MXML_ORNEMENT % 'inverted-mordent'
+            if note.nuances & ICTUS:
+                code += MXML_ARTICULATION % 'staccatissimo'
+            if note.nuances & EPISEME:
+                code += MXML_ARTICULATION % 'tenuto'
+            code += '        </notations>\n'
+        if parole or extension:
+            code += '        <lyric number="1">\n'
+            if parole:
+                code += (
+                    '          <syllabic>' + parole[0] + '</syllabic>\n'
+                    + '          <text>' + escape(parole[1], quote=False)
+                    + '</text>\n'
+                )
+            if extension:
+                code += '          <extend type="' + extension + '" />\n'
+            code += '        </lyric>\n'
+        return code + '      </note>\n'
+
+    @classmethod
+    def traiter_partition(cls, partition):  # pylint:disable=R0912
+        """Notes et barres de la partition
+
+        Renvoie, au fil de la partition, pour chaque note une liste
+        [note, poutre, parole, extension], où parole est un couple
+        (syllabique, texte) ; pour chaque changement de mesure, le style de
+        la barre ('' pour une barre simple).
+
+        Les poutres relient les croches d'un même élément neumatique. Le texte
+        d'une syllabe est porté par sa première note, si seules des
+        altérations la précèdent, et prolongé sur les suivantes ; celui d'une
+        syllabe qui commence par une barre (astérisque…) complète la dernière
+        syllabe chantée. Une note n'est renvoyée qu'une fois sa poutre, ses
+        paroles et son extension connues.
+        """
+        attente = deque()
+        # Dernière note portant une poutre, et fin d'élément neumatique
+        # depuis celle-ci.
+        poutre = None
+        coupure = True
+        # Dernière note portant des paroles (texte ou prolongation), dernière
+        # note portant un texte, et mot inachevé (syllabe suivie d'un tiret).
+        parole = None
+        chantee = None
+        tiret = False
+        barre = None
+        note = None
+        for mot in partition:
+            for syllabe in mot:
+                suite = syllabe is not mot[-1]
+                texte = syllabe.paroles
+                # La syllabe n'a pas encore rencontré d'autre signe que des
+                # altérations.
+                debut = True
+                for j, signe in enumerate(syllabe.musique):
+                    if isinstance(signe, Note):
+                        if barre is not None:
+                            attente.append(barre)
+                            barre = None
+                        croche = not signe.nuances & POINT
+                        note = [signe, None, None, None]
+                        if poutre is not None:
+                            if coupure or not croche:
+                                cls.fermer_poutre(poutre)
+                                poutre = None
+                            else:
+                                note[1] = 'continue'
+                        if croche:
+                            note[1] = note[1] or 'begin'
+                            poutre = note
+                        coupure = signe.fin_element
+                        if debut and texte:
+                            note[2] = cls.syllabique(tiret, suite), texte
+                            tiret = suite
+                            parole = chantee = note
+                        elif parole is not None and not (debut and suite):
+                            cls.prolonger(parole, note)
+                            parole = note
+                        debut = False
+                        attente.append(note)
+                    elif isinstance(signe, Barre):
+                        if j == 0 and texte and chantee is not None:
+                            cls.rattacher(chantee, texte, suite)
+                            tiret = suite
+                        if poutre is not None:
+                            cls.fermer_poutre(poutre)
+                            poutre = None
+                        coupure = True
+                        # Une barre ne sépare deux mesures que si elle est
+                        # suivie d'une note : la dernière est remplacée par la
+                        # barre finale, et deux barres successives n'en font
+                        # qu'une.
+                        if note is not None:
+                            barre = MXML_BARRES[signe.gabc]
+                        debut = False
+                    elif not isinstance(signe, Alteration):
+                        debut = False
+                    # Renvoi des notes désormais complètes.
+                    while attente and attente[0] is not poutre \
+                            and attente[0] is not parole \
+                            and attente[0] is not chantee:
+                        yield attente.popleft()
+            coupure = True
+        if poutre is not None:
+            cls.fermer_poutre(poutre)
+        yield from attente
+
+    @staticmethod
+    def fermer_poutre(note):
+        """Fin de la poutre à cette note (supprimée si elle y commençait)"""
+        note[1] = None if note[1] == 'begin' else 'end'
+
+    @staticmethod
+    def syllabique(tiret, suite):
+        """Position de la syllabe dans son mot
+
+        tiret indique que le mot a commencé avant elle, suite qu'il continue
+        après.
+        """
+        if suite:
+            return 'middle' if tiret else 'begin'
+        return 'end' if tiret else 'single'
+
+    @staticmethod
+    def prolonger(parole, note):
+        """Prolongation jusqu'à cette note des paroles de la précédente"""
+        if parole[3] is None:
+            parole[3] = 'start'
+        elif parole[3] == 'stop':
+            parole[3] = 'continue'
+        note[3] = 'stop'
+
+    @classmethod
+    def rattacher(cls, note, texte, suite):
+        """Texte d'une syllabe commençant par une barre
+
+        Il complète celui de la dernière syllabe chantée, porté par note.
+        """
+        syllabique, texte_precedent = note[2]
+        note[2] = (
+            cls.syllabique(syllabique in ('middle', 'end'), suite),
+            texte_precedent + ' ' + texte.lstrip()
+        )
 
 
 class Midi:
-    """Musique midi"""
-    def __init__(self, partition, titre, tempo):
-        # Définition des paramètres MIDI.
-        piste = 0
-        temps = 0
+    """Musique midi
+
+    Par défaut, la durée de chaque note est arrondie à un nombre entier de
+    temps, et un changement de tempo la ramène à sa durée réelle. Avec
+    ticks=True, les durées sont exprimées exactement en ticks, et le tempo
+    n'est donné qu'une fois.
+
+    Avec compact=True, le fichier est écrit en « running status » : l'octet
+    de statut n'est pas répété d'une note à l'autre, et la fin d'une note est
+    une note de vélocité nulle.
+    """
+    def __init__(self, partition, titre, tempo, ticks=False, compact=False):
+        self.partition = partition
+        self.titre = titre
         self.tempo = tempo / 2
-        self.sortiemidi = MIDIFile(1, file_format=1)
-        # Nom de la piste.
-        self.sortiemidi.addTrackName(piste, temps, sansaccents(titre))
-        # Tempo.
-        self.sortiemidi.addTempo(piste, temps, self.tempo)
-        # Instrument (74 : flûte).
-        self.sortiemidi.addProgramChange(piste, 0, temps, 74)
-        self.traiter_partition(partition, piste, temps)
+        self.ticks = ticks
+        self.compact = compact
+
+    def notes(self):
+        """Notes de la partition, dans l'ordre
+
+        Les notes sont lues dans la représentation en colonnes de la partition,
+        sous la forme (hauteur, début, durée, tempo, syllabe). Début et durée
+        sont en ticks : les durées de la partition étant des multiples de 0,1
+        temps (épisème, point, posés des barres), elles tombent juste,
+        puisqu'il y en a 960 par noire. Le tempo est None avec ticks=True. La
+        syllabe n'est donnée qu'avec sa première note.
+        """
+        ticks_par_noire = TICKSPERQUARTERNOTE
+        ticks_par_temps = ticks_par_noire / 2
+        transposition = self.partition.transposition
+        colonnes = self.partition.colonnes
+        syllabes = self.partition.syllabes
+        syllabe_precedente = None
+        temps = 0
+        for hauteur, duree_note, i_syllabe in zip(
+                colonnes.hauteurs, colonnes.durees, colonnes.syllabes
+        ):
+            if not hauteur:
+                continue
+            syllabe = None
+            if i_syllabe != syllabe_precedente:
+                syllabe = syllabes[i_syllabe]
+                syllabe_precedente = i_syllabe
+            if self.ticks:
+                duree = round(duree_note * ticks_par_temps)
+                yield hauteur + transposition, temps, duree, None, syllabe
+            else:
+                duree = int(duree_note)
+                tempo = self.tempo * duree / duree_note
+                duree = duree / 2
+                yield (
+                    hauteur + transposition, int(temps * ticks_par_noire),
+                    int(duree * ticks_par_noire), tempo, syllabe
+                )
+            temps += duree
+
+    def traiter_partition(self, flux, titre='nom'):
+        """Création des évènements MIDI
 
-    def traiter_partition(self, partition, piste, temps):
-        """Création des évènements MIDI"""
-        transposition = partition.transposition
-        channel = 0
+        Les évènements sont encodés au fil de la partition, directement dans
+        le flux : la piste des tempos d'abord, puis celle des notes, où chaque
+        syllabe accompagne sa première note.
+
+        Par défaut, le titre est le nom de la piste des notes. Avec
+        titre='marqueur', il est donné par un marqueur, qui délimite la pièce
+        dans une piste commune à plusieurs ; avec titre=None, il est omis,
+        pour être donné par ailleurs (cf. LivreMidi).
+        """
+        canal = 0
         volume = 127
-        for mot in partition:
-            for i, syllabe in enumerate(mot):
+        # Piste des tempos.
+        flux.ouvrir_piste()
+        precedent = flux.tempo(0, self.tempo)
+        if not self.ticks:
+            for _, debut, _, tempo, _ in self.notes():
+                # Deux tempos identiques au même instant n'en font qu'un.
+                if (debut, int(60000000 / tempo)) != precedent:
+                    precedent = flux.tempo(debut, tempo)
+        flux.fermer_piste()
+        # Piste des notes.
+        flux.ouvrir_piste()
+        if titre == 'marqueur':
+            flux.marqueur(0, sansaccents(self.titre))
+        elif titre is not None:
+            flux.nom_piste(0, sansaccents(self.titre))
+        # Instrument (74 : flûte).
+        flux.programme(0, canal, 74)
+        note = fin = None
+        for hauteur, debut, duree, _, syllabe in self.notes():
+            if note is not None and fin < debut:
+                flux.note_off(fin, canal, note, volume)
+                note = None
+            # Le texte de la syllabe passe avant la fin de la note précédente.
+            if syllabe is not None:
                 syl = str(syllabe)
-                if i + 1 < len(mot):
+                if syllabe is not syllabe.mot[-1]:
                     syl = syl + '-'
-                for j, note in enumerate(
-                        notes for notes in syllabe.musique
-                        if isinstance(notes, Note)
-                ):
-                    pitch = note.hauteur + transposition
-                    duree = int(note.duree)
-                    self.sortiemidi.addTempo(
-                        piste, temps, (self.tempo * duree / note.duree)
-                    )
-                    self.sortiemidi.addNote(
-                        piste,
-                        channel,
-                        pitch,
-                        temps,
-                        duree / 2,
-                        volume
-                    )
-                    if j == 0:
-                        self.sortiemidi.addText(
-                            piste,
-                            temps,
-                            syl
-                        )
-                    temps += duree / 2
+                flux.texte(debut, syl)
+            if note is not None:
+                flux.note_off(fin, canal, note, volume)
+            flux.note_on(debut, canal, hauteur, volume)
+            note, fin = hauteur, debut + duree
+        if note is not None:
+            flux.note_off(fin, canal, note, volume)
+        flux.fermer_piste()
+
+    @property
+    def octets(self):
+        """Contenu binaire du fichier MIDI"""
+        tampon = io.BytesIO()
+        self.ecrire_tampon(tampon)
+        return tampon.getvalue()
+
+    def ecrire_tampon(self, tampon):
+        """Écriture du fichier MIDI dans un tampon binaire
+
+        Les évènements y sont envoyés au fur et à mesure de leur production.
+        La longueur de chaque piste n'étant connue qu'à la fin, elle est
+        reportée après coup : si le tampon ne permet pas de revenir en arrière
+        (sortie standard, socket…), le fichier est d'abord assemblé en mémoire.
+        """
+        if not tampon.seekable():
+            tampon.write(self.octets)
+            return
+        self.traiter_partition(FluxMidi(tampon, 2, compact=self.compact))
 
     def ecrire(self, chemin):
         """Écriture effective du fichier MIDI"""
-        with (
-            open(sys.stdout.fileno(), 'wb')
-            if chemin == '-'
-            else open(chemin, 'wb')
-        ) as sortie:
-            self.sortiemidi.writeFile(sortie)
+        FichierTexte(chemin).ecrire(self.octets)
+
+    def pistes(self, marqueur=False):
+        """Pistes du fichier MIDI, encodées
+
+        Renvoie, pour chaque piste, un couple (octets, instant du dernier
+        évènement), sans en-tête ni fin de piste : de quoi la recopier dans un
+        autre flux (cf. FluxMidi.recopier). Le titre n'y figure que si
+        marqueur=True, sous forme de marqueur : un nom de piste doit rester à
+        l'instant 0 de sa piste, et c'est donc à celle qui reçoit la copie de
+        le donner.
+        """
+        tampon = io.BytesIO()
+        flux = FluxMidi(tampon, 2, compact=self.compact)
+        self.traiter_partition(flux, 'marqueur' if marqueur else None)
+        octets = tampon.getbuffer()
+        return [
+            (bytes(octets[debut:fin]), tick)
+            for debut, fin, tick in flux.bornes
+        ]
+
+
+class MidiDirect:
+    """Musique midi jouée en direct
+
+    Un fichier midi ne peut être joué qu'entier : la longueur de chaque piste
+    figure dans son en-tête, et les lecteurs (timidity…) le chargent avant
+    d'en jouer la première note. Ici, les messages midi sont écrits bruts,
+    sans en-tête ni délais, chacun à son heure : la lecture commence dès que
+    le premier mot du gabc est analysé, les suivants l'étant pendant qu'elle
+    se poursuit. Ce flux convient à un périphérique ou à un synthétiseur
+    midi ; les paroles, qui n'ont pas d'équivalent en dehors d'un fichier,
+    n'y figurent pas.
+
+    La transposition automatique dépend de la tessiture de toute la
+    partition : sans transposition explicite, la lecture ne commence donc
+    qu'une fois le gabc entièrement analysé.
+    """
+    def __init__(self, gabc, tempo, transposition=None):
+        self.gabc = gabc
+        self.tempo = tempo
+        self.transposition = transposition
+        self.partition = Partition(
+            gabc.entetes['name'], transposition=transposition
+        )
+
+    def mots(self):
+        """Mots de la partition, analysés à la demande"""
+        mots = self.gabc.mots(self.partition)
+        if self.transposition is None:
+            mots = list(mots)
+        yield from mots
+
+    def notes(self):
+        """Notes (hauteur, durée en temps), au fil de l'analyse
+
+        La durée d'une note n'est définitive qu'une fois la suivante lue : une
+        barre peut encore l'allonger. Chaque note n'est donc renvoyée qu'à ce
+        moment-là.
+        """
+        precedente = None
+        for mot in self.mots():
+            for syllabe in mot:
+                for signe in syllabe.musique:
+                    if isinstance(signe, Note):
+                        if precedente is not None:
+                            yield precedente.hauteur, precedente.duree
+                        precedente = signe
+        if precedente is not None:
+            yield precedente.hauteur, precedente.duree
+
+    def messages(self):
+        """Messages midi, avec leur instant en secondes"""
+        secondes_par_temps = 60 / self.tempo
+        canal = 0
+        volume = 127
+        # Instrument (74 : flûte).
+        yield 0, bytes((0xc0 | canal, 74))
+        instant = 0
+        transposition = None
+        for hauteur, duree in self.notes():
+            if transposition is None:
+                transposition = self.partition.transposition
+            hauteur += transposition
+            yield instant, bytes((0x90 | canal, hauteur, volume))
+            instant += duree * secondes_par_temps
+            yield instant, bytes((0x80 | canal, hauteur, volume))
+
+    def jouer(self, tampon, attendre=time.sleep):
+        """Écriture des messages dans le tampon, chacun à son heure
+
+        Le tampon peut être tout objet doté de méthodes write et flush :
+        sortie standard, fichier spécial d'un périphérique midi…
+        """
+        debut = time.monotonic()
+        for instant, message in self.messages():
+            retard = debut + instant - time.monotonic()
+            if retard > 0:
+                attendre(retard)
+            tampon.write(message)
+            tampon.flush()
+
+
+class LivreMidi:
+    """Recueil midi : plusieurs pièces dans un même fichier
+
+    Les pièces se succèdent dans le temps, sur une piste des tempos commune.
+    Chacune a sa propre piste, à son nom ; avec sections=True, elles se
+    suivent dans une seule piste, au nom du recueil, chacune étant précédée
+    d'un marqueur portant son titre.
+
+    Les pièces sont ajoutées sous forme de pistes déjà encodées (cf.
+    Midi.pistes), accompagnées de leur titre : elles peuvent donc être
+    produites en parallèle, seul leur assemblage se faisant ici.
+    """
+    def __init__(self, titre, sections=False, compact=False):
+        self.titre = titre
+        self.sections = sections
+        self.compact = compact
+        self.pieces = []
+
+    def ajouter(self, piece):
+        """Ajout d'une pièce à la fin du recueil
+
+        La pièce est un couple (titre, pistes) ; une pièce vide (fichier en
+        erreur) est ignorée.
+        """
+        if piece:
+            self.pieces.append(piece)
+
+    @property
+    def octets(self):
+        """Contenu binaire du fichier MIDI"""
+        tampon = io.BytesIO()
+        self.ecrire_tampon(tampon)
+        return tampon.getvalue()
+
+    def ecrire_tampon(self, tampon):
+        """Écriture du recueil dans un tampon (cf. Midi.ecrire_tampon)"""
+        if not tampon.seekable():
+            tampon.write(self.octets)
+            return
+        flux = FluxMidi(
+            tampon, 2 if self.sections else 1 + len(self.pieces),
+            compact=self.compact
+        )
+        # Chaque pièce commence à la fin de sa dernière note.
+        debuts = []
+        debut = 0
+        for _, (_, (_, fin)) in self.pieces:
+            debuts.append(debut)
+            debut += fin
+        flux.ouvrir_piste()
+        for debut, (_, (tempos, _)) in zip(debuts, self.pieces):
+            flux.recopier(debut, tempos)
+        flux.fermer_piste()
+        if self.sections:
+            flux.ouvrir_piste()
+            flux.nom_piste(0, sansaccents(self.titre))
+        for debut, (titre, (_, notes)) in zip(debuts, self.pieces):
+            if not self.sections:
+                # Le nom de la piste est à l'instant 0, seuls les évènements
+                # de la pièce étant décalés.
+                flux.ouvrir_piste()
+                flux.nom_piste(0, sansaccents(titre))
+            flux.recopier(debut, notes)
+            if not self.sections:
+                flux.fermer_piste()
+        if self.sections:
+            flux.fermer_piste()
+
+
+class FluxMidi:
+    """Écriture directe d'un fichier MIDI
+
+    Pour une partition monodique (une voix, des notes qui se suivent sans se
+    chevaucher), la machinerie générale de MIDIFile est superflue :
+    évènements génériques, dédoublonnage, tri, passage aux temps relatifs…
+    Ici, les évènements doivent être donnés dans l'ordre : ils sont encodés
+    aussitôt et écrits dans le tampon, piste après piste. Le fichier obtenu
+    est identique à celui de MIDIFile. Les instants sont en ticks.
+    """
+    def __init__(
+            self, tampon, pistes, ticks_par_noire=TICKSPERQUARTERNOTE,
+            compact=False
+    ):
+        self.tampon = tampon
+        self.compact = compact
+        self.debut = self.tick = 0
+        self.statut = None
+        # Début et fin de chaque piste dans le tampon (hors fin de piste), et
+        # instant de son dernier évènement.
+        self.bornes = []
+        # En-tête : format 1, plusieurs pistes simultanées.
+        tampon.write(b'MThd' + struct.pack('>LHHH', 6, 1, pistes,
+                                           ticks_par_noire))
+
+    def ouvrir_piste(self):
+        """Début d'une piste, dont la longueur reste à écrire"""
+        self.tampon.write(b'MTrk\0\0\0\0')
+        self.debut = self.tampon.tell()
+        self.tick = 0
+        self.statut = None
+
+    def fermer_piste(self):
+        """Fin de la piste, et report de sa longueur dans son en-tête"""
+        self.bornes.append((self.debut, self.tampon.tell(), self.tick))
+        self.tampon.write(b'\x00\xff\x2f\x00')
+        fin = self.tampon.tell()
+        self.tampon.seek(self.debut - 4)
+        self.tampon.write(struct.pack('>L', fin - self.debut))
+        self.tampon.seek(fin)
+
+    def delta(self, tick):
+        """Temps écoulé depuis l'évènement précédent, encodé"""
+        delta = varLengthBytes(tick - self.tick)
+        self.tick = tick
+        return delta
+
+    def meta(self, tick, code, donnees):
+        """Méta-évènement"""
+        self.tampon.write(
+            self.delta(tick) + bytes((0xff, code))
+            + varLengthBytes(len(donnees)) + donnees
+        )
+        # Les méta-évènements interrompent le « running status ».
+        self.statut = None
+
+    def voie(self, tick, statut, *donnees):
+        """Évènement de voie (note, programme…)"""
+        if self.compact and statut == self.statut:
+            octets = bytes(donnees)
+        else:
+            octets = bytes((statut, *donnees))
+        self.statut = statut
+        self.tampon.write(self.delta(tick) + octets)
+
+    def recopier(self, tick, piste):
+        """Recopie d'une piste encodée par un autre flux (cf. Midi.pistes)
+
+        Les évènements de la piste sont décalés de tick.
+        """
+        octets, dernier = piste
+        if not octets:
+            return
+        delta, taille = readVarLength(0, octets)
+        self.tampon.write(self.delta(tick + delta) + octets[taille:])
+        self.tick = tick + dernier
+        # Le statut en vigueur à la fin de la piste recopiée n'est pas connu.
+        self.statut = None
+
+    def nom_piste(self, tick, nom):
+        """Nom de la piste"""
+        self.meta(tick, 0x03, nom.encode('ISO-8859-1'))
+
+    def marqueur(self, tick, texte):
+        """Marqueur (début d'une section)"""
+        self.meta(tick, 0x06, texte.encode('ISO-8859-1'))
+
+    def texte(self, tick, texte):
+        """Texte (paroles)"""
+        self.meta(tick, 0x01, texte.encode('ISO-8859-1'))
+
+    def tempo(self, tick, tempo):
+        """Changement de tempo, donné en noires par minute
+
+        Renvoie le couple (instant, microsecondes par noire) écrit.
+        """
+        microsecondes = int(60000000 / tempo)
+        self.meta(tick, 0x51, struct.pack('>L', microsecondes)[1:])
+        return tick, microsecondes
+
+    def programme(self, tick, canal, programme):
+        """Choix de l'instrument"""
+        self.voie(tick, 0xc0 | canal, programme)
+
+    def note_on(self, tick, canal, hauteur, volume):
+        """Début d'une note"""
+        self.voie(tick, 0x90 | canal, hauteur, volume)
+
+    def note_off(self, tick, canal, hauteur, volume):
+        """Fin d'une note
+
+        En « running status », c'est une note de vélocité nulle.
+        """
+        if self.compact:
+            self.voie(tick, 0x90 | canal, hauteur, 0)
+        else:
+            self.voie(tick, 0x80 | canal, hauteur, volume)
 
 
 # # Classe générique pour faciliter l'écriture de fichiers.
@@ -1494,8 +2639,19 @@ class FichierTexte():
         return texte
 
     def ecrire(self, contenu):
-        """Écriture dans le fichier"""
-        if self.chemin == '-':
+        """Écriture dans le fichier
+
+        Le contenu peut être du texte ou, pour les formats binaires, des octets.
+        """
+        if isinstance(contenu, bytes):
+            if self.chemin == '-':
+                sys.stdout.flush()
+                sys.stdout.buffer.write(contenu)
+                sys.stdout.buffer.flush()
+            else:
+                with open(self.chemin, 'wb') as fichier:
+                    fichier.write(contenu)
+        elif self.chemin == '-':
             sys.stdout.write(contenu)
         else:
             with open(self.chemin, 'w', encoding='utf-8') as fichier:
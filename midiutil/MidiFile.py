@@ -33,6 +33,15 @@ FLATS = -1
 
 __all__ = ['MIDIFile', 'MAJOR', 'MINOR', 'SHARPS', 'FLATS']
 
+# Precompiled packers for the fixed-size parts of the events
+
+_struct_B = struct.Struct('>B')
+_struct_b = struct.Struct('>b')
+_struct_BB = struct.Struct('>BB')
+_struct_BBB = struct.Struct('>BBB')
+_struct_BBBB = struct.Struct('>BBBB')
+_struct_L = struct.Struct('>L')
+
 
 class GenericEvent(object):
     '''
@@ -115,15 +124,9 @@ class NoteOn(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = self.midi_status | self.channel
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', self.pitch)
-        midibytes += struct.pack('>B', self.volume)
-        return midibytes
+        varTime = varLengthBytes(self.tick - previous_event_tick)
+        return varTime + _struct_BBB.pack(
+            self.midi_status | self.channel, self.pitch, self.volume)
 
 
 class NoteOff (GenericEvent):
@@ -160,15 +163,9 @@ class NoteOff (GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = self.midi_status | self.channel
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', self.pitch)
-        midibytes += struct.pack('>B', self.volume)
-        return midibytes
+        varTime = varLengthBytes(self.tick - previous_event_tick)
+        return varTime + _struct_BBB.pack(
+            self.midi_status | self.channel, self.pitch, self.volume)
 
 
 class Tempo(GenericEvent):
@@ -212,19 +209,9 @@ class Tempo(GenericEvent):
         # Six identical lower-case letters such as tttttt refer to a 24-bit value, stored
         # most-significant-byte first. The notation len refers to the
 
-        midibytes = b""
-        code = 0xFF
-        subcode = 0x51
-        fourbite = struct.pack('>L', self.tempo)  # big-endian uint32
-        threebite = fourbite[1:4]  # Just discard the MSB
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', subcode)
-        midibytes += struct.pack('>B', 0x03)  # length in bytes of 24-bit tempo
-        midibytes += threebite
-        return midibytes
+        threebite = _struct_L.pack(self.tempo)[1:4]  # Just discard the MSB
+        varTime = varLengthBytes(self.tick - previous_event_tick)
+        return varTime + b'\xff\x51\x03' + threebite
 
 
 class Copyright(GenericEvent):
@@ -251,20 +238,9 @@ class Copyright(GenericEvent):
         # File, all of the copyright notices should be placed together in this
         # event so that it will be at the beginning of the file. This event
         # should be the first event in the track chunk, at tick 0.
-        midibytes = b""
-        code = 0xFF
-        subcode = 0x02
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', subcode)
-        payloadLength = len(self.notice)
-        payloadLengthVar = writeVarLength(payloadLength)
-        for i in payloadLengthVar:
-            midibytes += struct.pack("b", i)
-        midibytes += self.notice
-        return midibytes
+        varTime = varLengthBytes(self.tick - previous_event_tick)
+        return (varTime + b'\xff\x02' +
+                varLengthBytes(len(self.notice)) + self.notice)
 
 
 class Text(GenericEvent):
@@ -282,20 +258,9 @@ class Text(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = 0xFF
-        subcode = 0x01
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', subcode)
-        payloadLength = len(self.text)
-        payloadLengthVar = writeVarLength(payloadLength)
-        for i in payloadLengthVar:
-            midibytes += struct.pack("B", i)
-        midibytes += self.text
-        return midibytes
+        varTime = varLengthBytes(self.tick - previous_event_tick)
+        return (varTime + b'\xff\x01' +
+                varLengthBytes(len(self.text)) + self.text)
 
 
 class KeySignature(GenericEvent):
@@ -316,19 +281,11 @@ class KeySignature(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = 0xFF
-        subcode = 0x59
-        event_subtype = 0x02
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', subcode)
-        midibytes += struct.pack('>B', event_subtype)
-        midibytes += struct.pack('>b', self.accidentals * self.accidental_type)
-        midibytes += struct.pack('>B', self.mode)
-        return midibytes
+        # FF 59 02 is followed by the key and the mode.
+        varTime = varLengthBytes(self.tick - previous_event_tick)
+        return (varTime + b'\xff\x59\x02' +
+                _struct_b.pack(self.accidentals * self.accidental_type) +
+                _struct_B.pack(self.mode))
 
 
 class ProgramChange(GenericEvent):
@@ -357,14 +314,8 @@ class ProgramChange(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = self.midi_status | self.channel
-        varTime = writeVarLength(self.tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', self.programNumber)
-        return midibytes
+        return varLengthBytes(self.tick) + _struct_BB.pack(
+            self.midi_status | self.channel, self.programNumber)
 
 
 class SysExEvent(GenericEvent):
@@ -388,21 +339,10 @@ class SysExEvent(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = 0xF0
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-
-        payloadLength = writeVarLength(len(self.payload) + 2)
-        for lenByte in payloadLength:
-            midibytes += struct.pack('>B', lenByte)
-
-        midibytes += struct.pack('>B', self.manID)
-        midibytes += self.payload
-        midibytes += struct.pack('>B', 0xF7)
-        return midibytes
+        varTime = varLengthBytes(self.tick - previous_event_tick)
+        return (varTime + b'\xf0' +
+                varLengthBytes(len(self.payload) + 2) +
+                _struct_B.pack(self.manID) + self.payload + b'\xf7')
 
 
 class UniversalSysExEvent(GenericEvent):
@@ -430,29 +370,13 @@ class UniversalSysExEvent(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = 0xF0
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-
         # Do we need to add a length?
-        payloadLength = writeVarLength(len(self.payload) + 5)
-        for lenByte in payloadLength:
-            midibytes += struct.pack('>B', lenByte)
-
-        if self.realTime:
-            midibytes += struct.pack('>B', 0x7F)
-        else:
-            midibytes += struct.pack('>B', 0x7E)
-
-        midibytes += struct.pack('>B', self.sysExChannel)
-        midibytes += struct.pack('>B', self.code)
-        midibytes += struct.pack('>B', self.subcode)
-        midibytes += self.payload
-        midibytes += struct.pack('>B', 0xF7)
-        return midibytes
+        varTime = varLengthBytes(self.tick - previous_event_tick)
+        return (varTime + b'\xf0' +
+                varLengthBytes(len(self.payload) + 5) +
+                _struct_BBBB.pack(0x7F if self.realTime else 0x7E,
+                                  self.sysExChannel, self.code, self.subcode) +
+                self.payload + b'\xf7')
 
 
 class ControllerEvent(GenericEvent):
@@ -479,15 +403,10 @@ class ControllerEvent(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = self.midi_status | self.channel
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', self.controller_number)
-        midibytes += struct.pack('>B', self.parameter)
-        return midibytes
+        varTime = varLengthBytes(self.tick - previous_event_tick)
+        return varTime + _struct_BBB.pack(
+            self.midi_status | self.channel, self.controller_number,
+            self.parameter)
 
 
 class ChannelPressureEvent(GenericEvent):
@@ -515,14 +434,9 @@ class ChannelPressureEvent(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = self.midi_status | self.channel
-        vartick = writeVarLength(self.tick - previous_event_tick)
-        for x in vartick:
-            midibytes += struct.pack('>B', x)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', self.pressure_value)
-        return midibytes
+        varTime = varLengthBytes(self.tick - previous_event_tick)
+        return varTime + _struct_BB.pack(
+            self.midi_status | self.channel, self.pressure_value)
 
 
 class PitchWheelEvent(GenericEvent):
@@ -547,17 +461,11 @@ class PitchWheelEvent(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = self.midi_status | self.channel
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes = midibytes + struct.pack('>B', timeByte)
         MSB = (self.pitch_wheel_value + 8192) >> 7
         LSB = (self.pitch_wheel_value + 8192) & 0x7F
-        midibytes = midibytes + struct.pack('>B', code)
-        midibytes = midibytes + struct.pack('>B', LSB)
-        midibytes = midibytes + struct.pack('>B', MSB)
-        return midibytes
+        varTime = varLengthBytes(self.tick - previous_event_tick)
+        return varTime + _struct_BBB.pack(
+            self.midi_status | self.channel, LSB, MSB)
 
 
 class TrackName(GenericEvent):
@@ -583,18 +491,9 @@ class TrackName(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('B', 0xFF)
-        midibytes += struct.pack('B', 0X03)
-        dataLength = len(self.trackName)
-        dataLengthVar = writeVarLength(dataLength)
-        for i in dataLengthVar:
-            midibytes += struct.pack("B", i)
-        midibytes += self.trackName
-        return midibytes
+        varTime = varLengthBytes(self.tick - previous_event_tick)
+        return (varTime + b'\xff\x03' +
+                varLengthBytes(len(self.trackName)) + self.trackName)
 
 
 class TimeSignature(GenericEvent):
@@ -616,21 +515,12 @@ class TimeSignature(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = 0xFF
-        subcode = 0x58
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', subcode)
-        midibytes += struct.pack('>B', 0x04)
-        midibytes += struct.pack('>B', self.numerator)
-        midibytes += struct.pack('>B', self.denominator)
-        midibytes += struct.pack('>B', self.clocks_per_tick)
-        # 32nd notes per quarter note
-        midibytes += struct.pack('>B', self.notes_per_quarter)
-        return midibytes
+        # FF 58 04 is followed by the four bytes of the signature; the last
+        # one is the number of 32nd notes per quarter note.
+        varTime = varLengthBytes(self.tick - previous_event_tick)
+        return varTime + b'\xff\x58\x04' + _struct_BBBB.pack(
+            self.numerator, self.denominator, self.clocks_per_tick,
+            self.notes_per_quarter)
 
 
 class MIDITrack(object):
@@ -638,17 +528,20 @@ class MIDITrack(object):
     A class that encapsulates a MIDI track
     '''
 
-    def __init__(self, removeDuplicates, deinterleave):
+    def __init__(self, removeDuplicates, deinterleave, running_status=False):
         '''Initialize the MIDITrack object.
         '''
         self.headerString = struct.pack('cccc', b'M', b'T', b'r', b'k')
         self.dataLength = 0  # Is calculated after the data is in place
-        self.MIDIdata = b""
+        # A growable buffer: appending to it is amortized O(1), where
+        # concatenating bytes would copy the whole track for every event.
+        self.MIDIdata = bytearray()
         self.closed = False
         self.eventList = []
         self.MIDIEventList = []
         self.remdep = removeDuplicates
         self.deinterleave = deinterleave
+        self.running_status = running_status
 
     def addNoteByNumber(self, channel, pitch, tick, duration, volume,
                         annotation=None, insertion_order=0):
@@ -666,6 +559,25 @@ class MIDITrack(object):
                                       annotation=annotation,
                                       insertion_order=insertion_order))
 
+    def addNotesByNumber(self, channel, notes, insertion_order=0):
+        '''
+        Add several notes by chromatic MIDI number
+
+        ``notes`` is an iterable of ``(pitch, tick, duration, volume)``
+        tuples. Each note gets its own insertion order, starting at
+        ``insertion_order``; the next free one is returned.
+        '''
+        events = []
+        append = events.append
+        for pitch, tick, duration, volume in notes:
+            append(NoteOn(channel, pitch, tick, duration, volume,
+                          insertion_order=insertion_order))
+            append(NoteOff(channel, pitch, tick + duration, volume,
+                           insertion_order=insertion_order))
+            insertion_order += 1
+        self.eventList.extend(events)
+        return insertion_order
+
     def addControllerEvent(self, channel, tick, controller_number, parameter,
                            insertion_order=0):
         '''
@@ -779,11 +691,17 @@ class MIDITrack(object):
         '''
         Process the event list, creating a MIDIEventList,
         which is then sorted to be in chronological order by start tick.
+
+        This is the only place where the events are sorted: duplicates are
+        removed from the sorted list (see unique_events), and the
+        deinterleaving only sorts again if it has moved some events.
         '''
 
-        self.MIDIEventList = [evt for evt in self.eventList]
         # Assumptions in the code expect the list to be time-sorted.
-        self.MIDIEventList.sort(key=sort_events)
+        self.MIDIEventList = sorted(self.eventList, key=sort_events)
+
+        if self.remdep:
+            self.MIDIEventList = unique_events(self.MIDIEventList)
 
         if self.deinterleave:
             self.deInterleaveNotes()
@@ -797,21 +715,18 @@ class MIDITrack(object):
         otherwise.
         '''
 
-        # For this algorithm to work, the events in the eventList must be
-        # hashable (that is, they must have a __hash__() and __eq__() function
-        # defined).
+        # For this algorithm to work, the events in the eventList must have
+        # an __eq__() function defined.
 
-        s = set(self.eventList)
-        self.eventList = list(s)
-        self.eventList.sort(key=sort_events)
+        self.eventList = unique_events(sorted(self.eventList, key=sort_events))
 
     def closeTrack(self):
         '''
         Called to close a track before writing
 
         This function should be called to "close a track," that is to
-        prepare the actual data stream for writing. Duplicate events are
-        removed from the eventList, and the MIDIEventList is created.
+        prepare the actual data stream for writing. The MIDIEventList is
+        created, without the duplicate events.
 
         Called by the parent MIDIFile object.
         '''
@@ -820,9 +735,6 @@ class MIDITrack(object):
             return
         self.closed = True
 
-        if self.remdep:
-            self.removeDuplicates()
-
         self.processEventList()
 
     def writeMIDIStream(self):
@@ -847,14 +759,49 @@ class MIDITrack(object):
         Write the events in MIDIEvents to the MIDI stream.
         MIDIEventList is presumed to be already sorted in chronological order.
         '''
+        if self.running_status:
+            self.writeEventsWithRunningStatus()
+            return
         previous_event_tick = 0
+        MIDIdata = self.MIDIdata
         for event in self.MIDIEventList:
-            self.MIDIdata += event.serialize(previous_event_tick)
+            MIDIdata += event.serialize(previous_event_tick)
             # previous_event_tick = event.tick
             # I do not like that adjustTimeAndOrigin() changes GenericEvent.tick
             # from absolute to relative. I intend to change that, and just
             # calculate the relative tick here, without changing GenericEvent.tick
 
+    def writeEventsWithRunningStatus(self):
+        '''
+        Write the events in MIDIEvents to the MIDI stream, using running
+        status.
+
+        Channel events (those with a ``midi_status``) omit their status
+        byte when it is the same as that of the previous channel event, and
+        note off events are written as note on events with a velocity of 0.
+        Meta and system exclusive events cancel the running status, as the
+        Standard MIDI File specification requires.
+        '''
+        previous_event_tick = 0
+        MIDIdata = self.MIDIdata
+        running = None
+        for event in self.MIDIEventList:
+            midibytes = event.serialize(previous_event_tick)
+            if not hasattr(event, 'midi_status'):
+                running = None
+                MIDIdata += midibytes
+                continue
+            # The status byte follows the delta time.
+            i = len(varLengthBytes(event.tick - previous_event_tick))
+            if isinstance(event, NoteOff):
+                midibytes = midibytes[:i] + _struct_BBB.pack(
+                    NoteOn.midi_status | event.channel, event.pitch, 0)
+            status = midibytes[i]
+            if status == running:
+                midibytes = midibytes[:i] + midibytes[i + 1:]
+            running = status
+            MIDIdata += midibytes
+
     def deInterleaveNotes(self):
         '''
         Correct Interleaved notes.
@@ -865,39 +812,34 @@ class MIDITrack(object):
         MIDIEventList has been time-ordered.
         '''
 
-        tempEventList = []
+        # Open notes are keyed by channel and pitch (0-127), so that two
+        # distinct (channel, pitch) pairs never share a key. Only the tick of
+        # NoteOff events may change: the list itself is kept as is.
         stack = {}
+        moved = False
 
         for event in self.MIDIEventList:
-            if event.evtname in ['NoteOn', 'NoteOff']:
-                # !!! Pitch 101 channel 5 produces the same key as pitch 10 channel 15.
-                # !!! This is not the only pair of pitch,channel tuples which
-                # !!! collide to the same key, just one example.  Should fix by
-                # !!! putting a separator char between pitch and channel.
-                noteeventkey = str(event.pitch) + str(event.channel)
-                if event.evtname == 'NoteOn':
-                    if noteeventkey in stack:
-                        stack[noteeventkey].append(event.tick)
-                    else:
-                        stack[noteeventkey] = [event.tick]
-                    tempEventList.append(event)
-                elif event.evtname == 'NoteOff':
-                    if len(stack[noteeventkey]) > 1:
-                        event.tick = stack[noteeventkey].pop()
-                        tempEventList.append(event)
-                    else:
-                        stack[noteeventkey].pop()
-                        tempEventList.append(event)
-            else:
-                tempEventList.append(event)
-
-        self.MIDIEventList = tempEventList
+            if isinstance(event, NoteOn):
+                noteeventkey = (event.channel << 7) | event.pitch
+                ticks = stack.get(noteeventkey)
+                if ticks is None:
+                    stack[noteeventkey] = [event.tick]
+                else:
+                    ticks.append(event.tick)
+            elif isinstance(event, NoteOff):
+                ticks = stack[(event.channel << 7) | event.pitch]
+                tick = ticks.pop()
+                if ticks:
+                    moved = moved or tick != event.tick
+                    event.tick = tick
 
         # Note NoteOff events have a lower secondary sort key than NoteOn
         # events, so this sort will make concomitant NoteOff events
-        # processed first.
+        # processed first. If no event has been moved, the list is still
+        # sorted.
 
-        self.MIDIEventList.sort(key=sort_events)
+        if moved:
+            self.MIDIEventList.sort(key=sort_events)
 
     def adjustTimeAndOrigin(self, origin, adjust):
         '''
@@ -924,6 +866,9 @@ class MIDITrack(object):
     def writeTrack(self, fileHandle):
         '''
         Write track to disk.
+
+        The track data is handed to the file handle as is, without being
+        copied first.
         '''
 
         fileHandle.write(self.headerString)
@@ -983,7 +928,8 @@ class MIDIFile(object):
 
     def __init__(self, numTracks=1, removeDuplicates=True, deinterleave=True,
                  adjust_origin=False, file_format=1,
-                 ticks_per_quarternote=TICKSPERQUARTERNOTE, eventtime_is_ticks=False):
+                 ticks_per_quarternote=TICKSPERQUARTERNOTE,
+                 eventtime_is_ticks=False, running_status=False):
         '''Initialize the MIDIFile class
 
         :param numTracks: The number of tracks the file contains. Integer,
@@ -1008,6 +954,13 @@ class MIDIFile(object):
             argument values are integer ticks instead of fractional quarter
             notes.
 
+        :param running_status: If set True, the tracks are written in a more
+            compact form: the status byte of a channel event is left out when
+            it repeats that of the previous event, and note off events are
+            written as note on events with a velocity of 0, so that they can
+            share the status of the notes. The release velocity of the notes
+            is lost. Default is ``False``.
+
         Note that the default for ``adjust_origin`` will change in a future
         release, so one should probably explicitly set it.
 
@@ -1054,6 +1007,7 @@ class MIDIFile(object):
 
         self.adjust_origin = adjust_origin
         self.closed = False
+        self.tracks_closed = False
 
         self.ticks_per_quarternote = ticks_per_quarternote
         self.eventtime_is_ticks = eventtime_is_ticks
@@ -1063,7 +1017,8 @@ class MIDIFile(object):
             self.time_to_ticks = self.quarter_to_tick
 
         for i in range(0, self.numTracks):
-            self.tracks.append(MIDITrack(removeDuplicates, deinterleave))
+            self.tracks.append(MIDITrack(removeDuplicates, deinterleave,
+                                         running_status))
         # to keep track of the order of insertion for new sorting
         self.event_counter = 0
 
@@ -1108,6 +1063,31 @@ class MIDIFile(object):
                                            insertion_order=self.event_counter)
         self.event_counter += 1
 
+    def addNotes(self, track, channel, notes):
+        """
+
+        Add several notes to the MIDIFile object at once
+
+        :param track: The track to which the notes are added.
+        :param channel: the MIDI channel to assign to the notes. [Integer, 0-15]
+        :param notes: An iterable of ``(pitch, time, duration, volume)``
+            tuples, with the same meaning and units as the arguments of
+            :meth:`addNote`. Parallel sequences can be given as
+            ``zip(pitches, times, durations, volumes)``.
+
+        This is equivalent to calling :meth:`addNote` for each note in turn,
+        but the notes are converted and added to the track in a single pass.
+        """
+        if self.header.numeric_format == 1:
+            track += 1
+        if not self.eventtime_is_ticks:
+            # Same conversion as quarter_to_tick, without a call per value.
+            tpq = self.ticks_per_quarternote
+            notes = ((pitch, int(time * tpq), int(duration * tpq), volume)
+                     for pitch, time, duration, volume in notes)
+        self.event_counter = self.tracks[track].addNotesByNumber(
+            channel, notes, insertion_order=self.event_counter)
+
     def addTrackName(self, track, time, trackName):
         """
         Name a track.
@@ -1200,6 +1180,27 @@ class MIDIFile(object):
                                     insertion_order=self.event_counter)
         self.event_counter += 1
 
+    def addTempos(self, track, tempos):
+        """
+
+        Add several tempo events at once
+
+        :param track: The track to which the tempo events are added. Note
+            that in a format 1 file this parameter is ignored and the tempos
+            are written to the tempo track
+        :param tempos: An iterable of ``(time, tempo)`` tuples, as the
+            arguments of :meth:`addTempo`.
+        """
+        if self.header.numeric_format == 1:
+            track = 0
+        ticks, tpq = self.eventtime_is_ticks, self.ticks_per_quarternote
+        events = [Tempo(time if ticks else int(time * tpq), tempo,
+                        insertion_order=order)
+                  for order, (time, tempo)
+                  in enumerate(tempos, self.event_counter)]
+        self.tracks[track].eventList.extend(events)
+        self.event_counter += len(events)
+
     def addCopyright(self, track, time, notice):
         """
 
@@ -1269,6 +1270,25 @@ class MIDIFile(object):
                                    insertion_order=self.event_counter)
         self.event_counter += 1
 
+    def addTexts(self, track, texts):
+        """
+
+        Add several text events at once
+
+        :param track: The track to which the texts are added.
+        :param texts: An iterable of ``(time, text)`` tuples, as the
+            arguments of :meth:`addText`; lyrics of a song, for instance.
+        """
+        if self.header.numeric_format == 1:
+            track += 1
+        ticks, tpq = self.eventtime_is_ticks, self.ticks_per_quarternote
+        events = [Text(time if ticks else int(time * tpq), text,
+                       insertion_order=order)
+                  for order, (time, text)
+                  in enumerate(texts, self.event_counter)]
+        self.tracks[track].eventList.extend(events)
+        self.event_counter += len(events)
+
     def addProgramChange(self, tracknum, channel, time, program):
         """
 
@@ -1633,12 +1653,20 @@ class MIDIFile(object):
 
         self.header.writeFile(fileHandle)
 
-        # Close the tracks and have them create the MIDI event data structures.
-        self.close()
+        # Close the tracks: their events are sorted and made relative.
+        self.closeTracks()
 
-        # Write the MIDI Events to file.
-        for i in range(0, self.numTracks):
-            self.tracks[i].writeTrack(fileHandle)
+        # Write the MIDI Events to file. Unless close() has already built
+        # every track's data, each track is serialized just before it is
+        # written, and its data dropped right after, so that only one track
+        # is held in memory at a time.
+        for track in self.tracks:
+            if self.closed:
+                track.writeTrack(fileHandle)
+            else:
+                track.writeMIDIStream()
+                track.writeTrack(fileHandle)
+                track.MIDIdata = bytearray()
 
     def shiftTracks(self, offset=0):
         """Shift tracks to be zero-origined, or origined at offset.
@@ -1684,21 +1712,39 @@ class MIDIFile(object):
         if self.closed:
             return
 
+        self.closeTracks()
+
+        for i in range(0, self.numTracks):
+            self.tracks[i].writeMIDIStream()
+
+        self.closed = True
+
+    def closeTracks(self):
+        '''
+        Close the tracks, without creating their MIDI stream data.
+
+        The events of every track are sorted, and their times adjusted to the
+        origin and made relative: the tracks are then ready to be serialized,
+        either all at once by :meth:`close`, or one at a time by
+        :meth:`writeFile`.
+        '''
+
+        if self.tracks_closed:
+            return
+
         for i in range(0, self.numTracks):
-            self.tracks[i].closeTrack()
             # We want things like program changes to come before notes when
-            # they are at the same time, so we sort the MIDI events by both
-            # their start time and a secondary ordinality defined for each kind
-            # of event.
-            self.tracks[i].MIDIEventList.sort(key=sort_events)
+            # they are at the same time, so the track sorts the MIDI events by
+            # both their start time and a secondary ordinality defined for
+            # each kind of event.
+            self.tracks[i].closeTrack()
 
         origin = self.findOrigin()
 
         for i in range(0, self.numTracks):
             self.tracks[i].adjustTimeAndOrigin(origin, self.adjust_origin)
-            self.tracks[i].writeMIDIStream()
 
-        self.closed = True
+        self.tracks_closed = True
 
     def findOrigin(self):
         '''
@@ -1753,6 +1799,29 @@ def writeVarLength(i):
     return vlbytes
 
 
+# Encodings of the values below VARLENGTH_CACHE_LIMIT, filled as they are
+# met. Delta times and payload lengths take few distinct values in a file.
+
+VARLENGTH_CACHE_LIMIT = 0x4000  # up to two bytes
+_varLengthCache = {}
+
+
+def varLengthBytes(i):
+    '''
+    Return the variable length quantity of ``i`` as a bytestring.
+
+    This is :func:`writeVarLength`, returning bytes instead of a list and
+    caching the result for small values.
+    '''
+    try:
+        return _varLengthCache[i]
+    except KeyError:
+        vlbytes = bytes(bytearray(writeVarLength(i)))
+        if 0 <= i < VARLENGTH_CACHE_LIMIT:
+            _varLengthCache[i] = vlbytes
+        return vlbytes
+
+
 # readVarLength is taken from the MidiFile class.
 
 def readVarLength(offset, buffer):
@@ -1834,3 +1903,28 @@ def sort_events(event):
     '''
 
     return (event.tick, event.sec_sort_order, event.insertion_order)
+
+
+def unique_events(events):
+    '''
+    Remove duplicates from a list of events sorted with :func:`sort_events`.
+
+    Equal events have the same ``evtname``, hence the same class and
+    ``sec_sort_order``, and the same tick. In a sorted list, they can
+    therefore only be found within a run of events sharing these two keys:
+    only such runs are searched, and most events are not compared at all.
+    Of several equal events, the first one is kept.
+    '''
+    result = []
+    run = 0  # index in result of the first event of the current run
+    for event in events:
+        if result:
+            last = result[-1]
+            if (last.tick == event.tick and
+                    last.sec_sort_order == event.sec_sort_order):
+                if event in result[run:]:
+                    continue
+            else:
+                run = len(result)
+        result.append(event)
+    return result
@@ -0,0 +1,96 @@
+"""Conversion abc → MusicXML en parallèle dans des threads"""
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import os
+import re
+import sys
+import unittest
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+import gabctk  # noqa: E402 pylint:disable=C0413
+
+CORPUS = sorted(glob.glob(os.path.join(RACINE, 'tests', 'corpus', '*.gabc')))
+
+
+def normaliser(xml):
+    """Suppression de la date d'encodage, qui peut changer en cours de route"""
+    return re.sub('<encoding-date>.*?</encoding-date>', '', xml)
+
+
+def partitions():
+    """Code abc du corpus, chaque partition courte en plusieurs exemplaires
+
+    Les mêmes chaînes sont ainsi analysées en même temps par plusieurs
+    threads.
+    """
+    codes = []
+    for chemin in CORPUS:
+        with open(chemin, encoding='utf-8') as fichier:
+            gabc = gabctk.Gabc(fichier.read())
+        for transposition in (None, -3, 2):
+            code = gabctk.Abc(
+                gabc.partition(transposition=transposition),
+                titre=os.path.basename(chemin), tempo=165
+            )
+            if len(code.code) < 5000:
+                codes.extend([code] * 4)
+            elif transposition is None:
+                codes.extend([code] * 2)
+    return codes
+
+
+class TestThreads(unittest.TestCase):
+    """Le code MusicXML ne dépend pas du nombre de threads"""
+
+    def setUp(self):
+        gabctk.charger_abc2xml()
+        self.intervalle = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)  # changements de thread fréquents
+
+    def tearDown(self):
+        sys.setswitchinterval(self.intervalle)
+
+    def comparer(self):
+        """Comparaison des conversions en série et dans des threads"""
+        codes = partitions()
+        serie = [normaliser(code.xml) for code in codes]
+        with ThreadPoolExecutor(8) as executeur:
+            paralleles = list(executeur.map(
+                lambda code: normaliser(code.xml), codes
+            ))
+        self.assertEqual(len(paralleles), len(serie))
+        for attendu, obtenu in zip(serie, paralleles):
+            self.assertEqual(obtenu, attendu)
+
+    def test_corpus(self):
+        """Série et ThreadPoolExecutor donnent le même code MusicXML"""
+        self.comparer()
+
+    def test_packrat(self):
+        """Même résultat avec un cache packrat borné"""
+        from abc2xml.pyparsing import (  # pylint:disable=C0415
+            ParserElement
+        )
+        # pylint:disable=W0212
+        etat = (
+            ParserElement._packratEnabled,
+            ParserElement._packratLimit,
+            ParserElement._parse
+        )
+        gabctk.charger_abc2xml().enablePackrat(64)
+        self.assertTrue(ParserElement._packratEnabled)
+        self.assertEqual(ParserElement._packratLimit, 64)
+        try:
+            self.comparer()
+        finally:
+            (
+                ParserElement._packratEnabled,
+                ParserElement._packratLimit,
+                ParserElement._parse
+            ) = etat
+
+
+if __name__ == '__main__':
+    unittest.main()
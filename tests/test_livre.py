@@ -0,0 +1,74 @@
+"""Recueils midi : plusieurs pièces dans un même fichier"""
+import os
+import sys
+import unittest
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+import gabctk  # noqa: E402 pylint:disable=C0413
+from tests.test_midifile import read_events  # noqa: E402 pylint:disable=C0413
+
+CORPUS = os.path.join(RACINE, 'tests', 'corpus')
+PIECES = ('kyrie', 'alleluia', 'hymn')
+NOM_PISTE = (0xFF, 0x03)
+MARQUEUR = (0xFF, 0x06)
+
+
+def midi(nom):
+    """Fichier midi d'une pièce du corpus"""
+    with open(os.path.join(CORPUS, nom + '.gabc'), encoding='utf-8') as f:
+        gabc = gabctk.Gabc(f.read())
+    return gabctk.Midi(
+        gabc.partition(), gabc.entetes['name'], gabctk.TEMPO
+    )
+
+
+class TestLivre(unittest.TestCase):
+    """Assemblage des pièces"""
+
+    def livre(self, sections=False):
+        """Recueil des pièces, et évènements de chacune seule"""
+        livre = gabctk.LivreMidi('Recueil', sections=sections)
+        seules = []
+        for nom in PIECES:
+            piece = midi(nom)
+            livre.ajouter((piece.titre, piece.pistes(marqueur=sections)))
+            seules.append(read_events(piece.octets))
+        return read_events(livre.octets), seules
+
+    def test_pistes(self):
+        """Une piste par pièce, nommée à l'instant 0, notes décalées"""
+        livre, seules = self.livre()
+        self.assertEqual(len(livre), 1 + len(PIECES))
+        debut = 0
+        for piste, (_, notes) in zip(livre[1:], seules):
+            self.assertEqual(piste[0], notes[0])
+            self.assertEqual(piste[0][1], NOM_PISTE)
+            self.assertEqual(
+                piste[1:-1],
+                [(tick + debut, *evt) for tick, *evt in notes[1:-1]]
+            )
+            debut += notes[-1][0]
+
+    def test_sections(self):
+        """Une seule piste, chaque pièce annoncée par un marqueur"""
+        livre, seules = self.livre(sections=True)
+        self.assertEqual(len(livre), 2)
+        self.assertEqual(livre[1][0], (0, NOM_PISTE, b'Recueil'))
+        marqueurs = [evt for evt in livre[1] if evt[1] == MARQUEUR]
+        debut = 0
+        for marqueur, (_, notes) in zip(marqueurs, seules):
+            self.assertEqual(marqueur, (debut, MARQUEUR, notes[0][2]))
+            debut += notes[-1][0]
+
+    def test_piece_seule(self):
+        """Un recueil d'une seule pièce est le fichier de cette pièce"""
+        piece = midi('kyrie')
+        livre = gabctk.LivreMidi('Recueil')
+        livre.ajouter((piece.titre, piece.pistes()))
+        self.assertEqual(livre.octets, piece.octets)
+
+
+if __name__ == '__main__':
+    unittest.main()
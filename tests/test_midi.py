@@ -0,0 +1,100 @@
+"""Fichiers MIDI : encodage direct comparé à celui de MIDIFile"""
+import glob
+import io
+import os
+import sys
+import unittest
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+import gabctk  # noqa: E402 pylint:disable=C0413
+from midiutil.MidiFile import MIDIFile  # noqa: E402 pylint:disable=C0413
+
+CORPUS = sorted(glob.glob(os.path.join(RACINE, 'tests', 'corpus', '*.gabc')))
+
+
+def reference(partition, titre, tempo, ticks=False, compact=False):
+    """Fichier MIDI produit en passant par MIDIFile
+
+    C'est la façon dont Midi construisait ses fichiers avant d'encoder
+    lui-même les évènements (cf. FluxMidi) : le résultat doit être identique,
+    octet pour octet.
+    """
+    piste = 0
+    canal = 0
+    volume = 127
+    temps = 0
+    tempo = tempo / 2
+    sortie = MIDIFile(
+        1, file_format=1, eventtime_is_ticks=ticks, running_status=compact
+    )
+    sortie.addTrackName(piste, temps, gabctk.sansaccents(titre))
+    sortie.addTempo(piste, temps, tempo)
+    sortie.addProgramChange(piste, canal, temps, 74)
+    ticks_par_temps = sortie.ticks_per_quarternote / 2
+    syllabe_precedente = None
+    tempos = []
+    notes = []
+    paroles = []
+    for hauteur, duree_note, i_syllabe in zip(
+            partition.colonnes.hauteurs,
+            partition.colonnes.durees,
+            partition.colonnes.syllabes
+    ):
+        if not hauteur:
+            continue
+        if ticks:
+            duree = round(duree_note * ticks_par_temps)
+        else:
+            duree = int(duree_note)
+            tempos.append((temps, tempo * duree / duree_note))
+            duree = duree / 2
+        notes.append((hauteur + partition.transposition, temps, duree, volume))
+        if i_syllabe != syllabe_precedente:
+            syllabe = partition.syllabes[i_syllabe]
+            syl = str(syllabe)
+            if syllabe is not syllabe.mot[-1]:
+                syl = syl + '-'
+            paroles.append((temps, syl))
+            syllabe_precedente = i_syllabe
+        temps += duree
+    sortie.addTempos(piste, tempos)
+    sortie.addNotes(piste, canal, notes)
+    sortie.addTexts(piste, paroles)
+    tampon = io.BytesIO()
+    sortie.writeFile(tampon)
+    return tampon.getvalue()
+
+
+class TestMidi(unittest.TestCase):
+    """Midi produit les mêmes octets que MIDIFile"""
+
+    def test_corpus(self):
+        """Toutes les partitions, dans tous les modes"""
+        for chemin in CORPUS:
+            with open(chemin, encoding='utf-8') as fichier:
+                gabc = gabctk.Gabc(fichier.read())
+            titre = os.path.basename(chemin)
+            for transposition in (None, -3, 4):
+                partition = gabc.partition(transposition=transposition)
+                for ticks in (False, True):
+                    for compact in (False, True):
+                        with self.subTest(
+                                partition=titre, transposition=transposition,
+                                ticks=ticks, compact=compact
+                        ):
+                            self.assertEqual(
+                                gabctk.Midi(
+                                    partition, titre, 165,
+                                    ticks=ticks, compact=compact
+                                ).octets,
+                                reference(
+                                    partition, titre, 165,
+                                    ticks=ticks, compact=compact
+                                )
+                            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""Events of the files written by MIDIFile"""
+import io
+import os
+import struct
+import sys
+import unittest
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from midiutil.MidiFile import (  # noqa: E402 pylint:disable=C0413
+    MIDIFile, readVarLength
+)
+
+# Number of data bytes following the status byte of each channel message.
+DATA_LENGTH = {0x8: 2, 0x9: 2, 0xA: 2, 0xB: 2, 0xC: 1, 0xD: 1, 0xE: 2}
+
+
+def read_events(data):
+    '''
+    A minimal Standard MIDI File reader.
+
+    It returns, for each track, the list of its events as
+    ``(absolute tick, kind, payload)`` tuples. Running status is expanded,
+    and a note on with a velocity of 0 is read as a note off, so that the
+    compact and the regular encodings of a file give the same events.
+    '''
+    assert data[:4] == b'MThd'
+    length, _, ntracks, _ = struct.unpack_from('>LHHH', data, 4)
+    offset = 8 + length
+    tracks = []
+    for _ in range(ntracks):
+        assert data[offset:offset + 4] == b'MTrk'
+        length = struct.unpack_from('>L', data, offset + 4)[0]
+        offset += 8
+        end = offset + length
+        events = []
+        tick = 0
+        status = None
+        while offset < end:
+            delta, size = readVarLength(offset, data)
+            offset += size
+            tick += delta
+            if data[offset] & 0x80:
+                status = data[offset]
+                offset += 1
+            if status in (0xF0, 0xF7):
+                length, size = readVarLength(offset, data)
+                offset += size
+                events.append((tick, status, data[offset:offset + length]))
+                offset += length
+                status = None
+            elif status == 0xFF:
+                kind = data[offset]
+                length, size = readVarLength(offset + 1, data)
+                offset += 1 + size
+                events.append(
+                    (tick, (status, kind), data[offset:offset + length])
+                )
+                offset += length
+                status = None
+            else:
+                assert status is not None, 'running status without status'
+                payload = data[offset:offset + DATA_LENGTH[status >> 4]]
+                offset += len(payload)
+                if status >> 4 == 0x9 and payload[1] == 0:
+                    events.append((tick, 0x80 | status & 0x0F, payload[:1]))
+                elif status >> 4 == 0x8:
+                    events.append((tick, status, payload[:1]))
+                else:
+                    events.append((tick, status, payload))
+        assert offset == end
+        tracks.append(events)
+    return tracks
+
+
+def write(running_status):
+    '''
+    A file using every kind of event, with interleaved channels.
+    '''
+    midi = MIDIFile(2, running_status=running_status)
+    midi.addTrackName(0, 0, 'round trip')
+    midi.addTempo(0, 0, 90)
+    midi.addTempos(0, [(4, 120), (6, 60)])
+    midi.addTimeSignature(0, 0, 3, 2, 24)
+    midi.addKeySignature(0, 0, 2, 1, 0)
+    for channel in (0, 1):
+        midi.addProgramChange(1, channel, 0, 74 + channel)
+    midi.addNotes(1, 0, [
+        (60 + i % 12, i / 2, 0.5 + i % 3, 100) for i in range(40)
+    ])
+    midi.addNotes(1, 1, [(48 + i % 5, i, 1, 64) for i in range(20)])
+    midi.addTexts(1, [(i, 'syl%d' % i) for i in range(0, 20, 3)])
+    midi.addControllerEvent(1, 0, 3, 7, 90)
+    midi.addPitchWheelEvent(1, 1, 5, 1000)
+    midi.addChannelPressure(1, 0, 7, 30)
+    midi.addSysEx(1, 8, 0x43, b'\x01\x02')
+    midi.addNote(1, 1, 50, 8, 2, 80)
+    tampon = io.BytesIO()
+    midi.writeFile(tampon)
+    return tampon.getvalue()
+
+
+class TestRunningStatus(unittest.TestCase):
+    '''
+    A file written with running status holds the same events.
+    '''
+
+    def test_round_trip(self):
+        regular = write(False)
+        compact = write(True)
+        self.assertLess(len(compact), len(regular))
+        events = read_events(regular)
+        # Notes on and off, texts, program changes, controller, pitch wheel
+        # and pressure, system exclusive, end of track.
+        self.assertEqual(len(events[2]), 2 * 61 + 7 + 2 + 3 + 1 + 1)
+        self.assertEqual(read_events(compact), events)
+
+
+class TestDeInterleave(unittest.TestCase):
+    '''
+    Overlapping notes keep their own note off.
+    '''
+
+    def test_key_collision(self):
+        # Pitch 101 on channel 5 and pitch 10 on channel 15 used to share
+        # the key "1015": the first note was then cut short when the second
+        # one started.
+        midi = MIDIFile(1)
+        midi.addNote(0, 5, 101, 0, 2, 100)
+        midi.addNote(0, 15, 10, 1, 2, 100)
+        tampon = io.BytesIO()
+        midi.writeFile(tampon)
+        notes = [
+            event for event in read_events(tampon.getvalue())[1]
+            if event[1] in (0x85, 0x95, 0x8F, 0x9F)
+        ]
+        self.assertEqual(notes, [
+            (0, 0x95, b'\x65\x64'),
+            (960, 0x9F, b'\x0a\x64'),
+            (1920, 0x85, b'\x65'),
+            (2880, 0x8F, b'\x0a'),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Paroles et poutres du MusicXML, tirées directement de la partition"""
+from html import escape
+import os
+import re
+import sys
+import unittest
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+import gabctk  # noqa: E402 pylint:disable=C0413
+
+
+def notes(gabc):
+    """Notes de la partition, telles que les renvoie MusicXML"""
+    partition = gabctk.Gabc(gabc).partition(transposition=0)
+    return [
+        element for element in gabctk.MusicXML.traiter_partition(partition)
+        if not isinstance(element, str)
+    ]
+
+
+class TestParoles(unittest.TestCase):
+    """Répartition des paroles sur les notes"""
+
+    def test_syllabes(self):
+        """Le texte de chaque syllabe est porté par sa première note"""
+        self.assertEqual(
+            [(parole, extension) for _, _, parole, extension in notes(
+                '%%\n(c4) Ky(f)ri(gh)e(h) e(hg)(::)'
+            )],
+            [
+                (('begin', 'Ky'), None),
+                (('middle', 'ri'), 'start'),
+                (None, 'stop'),
+                (('end', 'e'), None),
+                (('single', 'e'), 'start'),
+                (None, 'stop'),
+            ]
+        )
+
+    def test_alteration(self):
+        """Une altération ne décale pas les paroles"""
+        self.assertEqual(
+            [parole for _, _, parole, _ in notes(
+                '%%\n(c4) a(hixi) b(ixh/ix:h) c(h)(::)'
+            )],
+            [('single', 'a'), None, ('single', 'b'), None, ('single', 'c')]
+        )
+
+    def test_barre(self):
+        """Le texte d'une barre complète la syllabe précédente"""
+        resultat = notes('%%\n(c4) ia.(hg.) *(;) ij.(h)(::)')
+        self.assertEqual(resultat[0][2:], [('single', 'ia. ✶'), 'start'])
+        self.assertEqual(resultat[1][2:], [None, 'stop'])
+        self.assertEqual(resultat[2][2:], [('single', 'ij.'), None])
+
+
+class TestPoutres(unittest.TestCase):
+    """Les poutres relient les croches d'un même élément neumatique"""
+
+    def test_elements(self):
+        """Coupures neumatiques, points et fins de neume ferment la poutre"""
+        self.assertEqual(
+            [poutre for _, poutre, _, _ in notes(
+                '%%\n(c4) a(fgh/ghg.) b(hi)(::)'
+            )],
+            ['begin', 'continue', 'end', 'begin', 'end', None, 'begin', 'end']
+        )
+
+
+class TestCorpus(unittest.TestCase):
+    """Toutes les syllabes chantées du corpus se retrouvent dans le MusicXML"""
+
+    def test_textes(self):
+        """Les textes du MusicXML sont ceux des syllabes, dans l'ordre"""
+        dossier = os.path.join(RACINE, 'tests', 'corpus')
+        for nom in sorted(os.listdir(dossier)):
+            with open(os.path.join(dossier, nom), encoding='utf-8') as f:
+                gabc = f.read()
+            partition = gabctk.Gabc(gabc).partition()
+            attendu = ' '.join(
+                syllabe.paroles for syllabe in partition.syllabes
+                if any(
+                    isinstance(signe, (gabctk.Note, gabctk.Barre))
+                    for signe in syllabe.musique
+                )
+            )
+            code = gabctk.MusicXML(partition, nom, 165).code
+            obtenu = ' '.join(re.findall('<text>(.*)</text>', code))
+            with self.subTest(partition=nom):
+                self.assertEqual(
+                    obtenu.split(), escape(attendu, quote=False).split()
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
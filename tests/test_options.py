@@ -0,0 +1,126 @@
+"""Options de la ligne de commande"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+import gabctk  # noqa: E402 pylint:disable=C0413
+
+KYRIE = os.path.join(RACINE, 'tests', 'corpus', 'kyrie.gabc')
+HYMN = os.path.join(RACINE, 'tests', 'corpus', 'hymn.gabc')
+SORTIES = (
+    ('-o', '.mid'), ('-l', '.ly'), ('-c', '.abc'), ('-x', '.xml'),
+    ('-e', '.txt'), ('-m', '.mus'), ('-b', '.tab')
+)
+
+
+def executer(*arguments):
+    """Lancement de gabctk ; renvoie son code de sortie"""
+    with contextlib.redirect_stderr(io.StringIO()), \
+            contextlib.redirect_stdout(io.StringIO()):
+        try:
+            gabctk.traiter_options(list(arguments))
+        except SystemExit as sortie:
+            return sortie.code
+    return None
+
+
+class TestOptions(unittest.TestCase):
+    """Analyse des options"""
+
+    def test_tempo(self):
+        """Le tempo demandé par -t est bien celui du fichier midi"""
+        with tempfile.TemporaryDirectory() as dossier:
+            tempos = {}
+            for tempo in ('165', '120'):
+                chemin = os.path.join(dossier, tempo + '.mid')
+                self.assertEqual(
+                    executer('-i', KYRIE, '-o', chemin, '-t', tempo), 0
+                )
+                with open(chemin, 'rb') as fichier:
+                    tempos[tempo] = fichier.read()
+            self.assertNotEqual(tempos['165'], tempos['120'])
+            chemin = os.path.join(dossier, 'defaut.mid')
+            self.assertEqual(executer('-i', KYRIE, '-o', chemin), 0)
+            with open(chemin, 'rb') as fichier:
+                self.assertEqual(fichier.read(), tempos[str(gabctk.TEMPO)])
+
+    def test_direct(self):
+        """--direct n'écrit ni dans un fichier ni dans un dossier"""
+        with tempfile.TemporaryDirectory() as dossier:
+            self.assertEqual(
+                executer('-i', KYRIE, '-o', dossier, '--direct'), 2
+            )
+            self.assertEqual(os.listdir(dossier), [])
+            chemin = os.path.join(dossier, 'kyrie.mid')
+            self.assertEqual(
+                executer('-i', KYRIE, '-o', chemin, '--direct'), 2
+            )
+            self.assertFalse(os.path.exists(chemin))
+        self.assertTrue(gabctk.est_flux('-'))
+        self.assertTrue(gabctk.est_flux(os.devnull))
+
+    def test_livre_dossier(self):
+        """--livre attend un fichier"""
+        with tempfile.TemporaryDirectory() as dossier:
+            self.assertEqual(executer('-i', KYRIE, '--livre', dossier), 2)
+            self.assertEqual(os.listdir(dossier), [])
+
+    def test_packrat(self):
+        """--packrat ne vaut qu'avec --abc2xml"""
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin = os.path.join(dossier, 'kyrie.xml')
+            self.assertEqual(
+                executer('-i', KYRIE, '-x', chemin, '--packrat', '64'), 2
+            )
+            self.assertEqual(
+                executer('-i', KYRIE, '--abc2xml', '-x', chemin,
+                         '--packrat', '-1'), 2
+            )
+            self.assertEqual(os.listdir(dossier), [])
+
+    def test_lot(self):
+        """Avec plusieurs entrées, chaque fichier a ses propres sorties"""
+        with tempfile.TemporaryDirectory() as dossier:
+            arguments = ['-i', KYRIE, HYMN]
+            for option, _ in SORTIES:
+                arguments += [option, dossier]
+            self.assertEqual(executer(*arguments), 0)
+            self.assertEqual(sorted(os.listdir(dossier)), sorted(
+                nom + extension for nom in ('kyrie', 'hymn')
+                for _, extension in SORTIES
+            ))
+            # Mêmes sorties que pour chaque fichier traité seul.
+            for entree in (KYRIE, HYMN):
+                nom = os.path.splitext(os.path.basename(entree))[0]
+                for option, extension in SORTIES[4:]:
+                    chemin = os.path.join(dossier, 'seul' + extension)
+                    self.assertEqual(
+                        executer('-i', entree, option, chemin), 0
+                    )
+                    with open(chemin, encoding='utf-8') as seul, open(
+                            os.path.join(dossier, nom + extension),
+                            encoding='utf-8'
+                    ) as lot:
+                        self.assertEqual(lot.read(), seul.read())
+
+    def test_lot_fichier(self):
+        """Plusieurs entrées ne peuvent partager un même fichier de sortie"""
+        with tempfile.TemporaryDirectory() as dossier:
+            for option, extension in SORTIES:
+                chemin = os.path.join(dossier, 'commun' + extension)
+                self.assertEqual(
+                    executer('-i', KYRIE, HYMN, '-o', dossier, option, chemin),
+                    2
+                )
+                self.assertEqual(os.listdir(dossier), [])
+            self.assertEqual(executer('-i', KYRIE, HYMN, '-e', '-'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+"""Partition : hauteurs des notes, agrégats calculés une fois"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+import gabctk  # noqa: E402 pylint:disable=C0413
+
+KYRIE = os.path.join(RACINE, 'tests', 'corpus', 'kyrie.gabc')
+
+
+class TestAgregats(unittest.TestCase):
+    """Mise en cache des agrégats de Partition"""
+
+    def setUp(self):
+        with open(KYRIE, encoding='utf-8') as fichier:
+            self.gabc = gabctk.Gabc(fichier.read())
+        self.partition = self.gabc.partition()
+        self.mots = list(self.partition)
+        # Chaque calcul des agrégats construit une nouvelle Colonnes.
+        self.colonnes = mock.patch.object(
+            gabctk.Colonnes, '__init__', autospec=True,
+            side_effect=gabctk.Colonnes.__init__
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def lire(self, fois=3):
+        """Accès répétés aux agrégats"""
+        for _ in range(fois):
+            valeurs = (
+                self.partition.colonnes, self.partition.musique,
+                self.partition.syllabes, self.partition.tessiture,
+                self.partition.transposition
+            )
+        return valeurs
+
+    def test_cache(self):
+        """Plusieurs accès, un seul calcul"""
+        premiers = self.lire(1)
+        derniers = self.lire()
+        self.assertEqual(self.colonnes.call_count, 1)
+        for premier, dernier in zip(premiers[:3], derniers[:3]):
+            self.assertIs(premier, dernier)
+
+    def test_exports(self):
+        """Une seule Colonnes pour tous les exports d'une partition"""
+        arguments = ['-i', KYRIE]
+        with tempfile.TemporaryDirectory() as dossier:
+            for option in ('-o', '-l', '-c', '-x', '-e', '-m', '-b'):
+                arguments += [option, dossier]
+            with contextlib.redirect_stdout(io.StringIO()), \
+                    self.assertRaises(SystemExit) as sortie:
+                gabctk.traiter_options(arguments)
+            self.assertEqual(sortie.exception.code, 0)
+            self.assertEqual(len(os.listdir(dossier)), 7)
+        self.assertEqual(self.colonnes.call_count, 1)
+
+    def verifier_recalcul(self, modification, attendu):
+        """Après modification, les agrégats sont recalculés une fois"""
+        colonnes, musique, syllabes = self.lire()[:3]
+        self.assertEqual(self.colonnes.call_count, 1)
+        modification()
+        colonnes2, musique2, syllabes2 = self.lire()[:3]
+        self.assertEqual(self.colonnes.call_count, 2)
+        self.assertIsNot(colonnes2, colonnes)
+        self.assertIsNot(musique2, musique)
+        self.assertIsNot(syllabes2, syllabes)
+        self.assertEqual(
+            syllabes2, [syllabe for mot in attendu for syllabe in mot]
+        )
+        self.assertEqual(
+            len(colonnes2.hauteurs),
+            sum(len(syllabe.musique) for syllabe in syllabes2)
+        )
+
+    def test_append(self):
+        """append invalide les agrégats"""
+        self.verifier_recalcul(
+            lambda: self.partition.append(self.mots[0]),
+            self.mots + self.mots[:1]
+        )
+
+    def test_extend(self):
+        """extend invalide les agrégats"""
+        self.verifier_recalcul(
+            lambda: self.partition.extend(self.mots[:2]),
+            self.mots + self.mots[:2]
+        )
+
+    def test_setitem(self):
+        """L'affectation d'un mot invalide les agrégats"""
+        def remplacer():
+            self.partition[0] = self.mots[-1]
+        self.verifier_recalcul(remplacer, self.mots[-1:] + self.mots[1:])
+
+    def test_invalider(self):
+        """Un mot modifié sur place se signale par invalider()"""
+        self.verifier_recalcul(
+            self.partition.invalider, self.mots
+        )
+
+
+def hauteurs(gabc):
+    """Hauteurs midi des notes d'une partition, sans transposition"""
+    partition = gabctk.Gabc('%%\n' + gabc).partition(transposition=0)
+    return [
+        signe.hauteur for neume in partition.musique for signe in neume
+        if isinstance(signe, gabctk.Note)
+    ]
+
+
+class TestAlterations(unittest.TestCase):
+    """Bémols à la clé et altérations explicites"""
+
+    def test_bemol_clef(self):
+        """Le bémol à la clé vaut pour toute la pièce"""
+        self.assertEqual(hauteurs('(cb3) si(g) si(g)'), [70, 70])
+
+    def test_becarre_clef(self):
+        """Un bécarre annule le bémol à la clé jusqu'à la fin du mot"""
+        self.assertEqual(
+            hauteurs('(cb3) si(gygg) si(g)(::)'), [71, 71, 70]
+        )
+
+    def test_bemol(self):
+        """Un bémol explicite vaut aussi avec une clé sans bémol"""
+        self.assertEqual(hauteurs('(c3) si(gxgg) si(g)(::)'), [70, 70, 71])
+
+
+if __name__ == '__main__':
+    unittest.main()